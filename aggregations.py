@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+# Etapas de la trayectoria asistencial que dibuja el diagrama de Sankey
+PATHWAY_STAGES = [
+    'enfermedades_cronicas', 'diagnosticos_previos', 'tratamientos_ant',
+    'medicamentos_recetados', 'procedimientos_realizados',
+]
+
+RATE_COLUMNS = ['satisfaccion_paciente', 'tasas_mortalidad', 'tasas_morbilidad', 'tasa_exito_tratamiento']
+
+# Resumen que consume cada gráfico: (dimensiones, {columna de salida: (columna, función)})
+# Las funciones son explícitas: 'sum', 'mean' o 'size' para el conteo de pacientes.
+CHART_AGGREGATIONS = {
+    'tasas_por_centro': (['id_centro_salud'], {
+        'tasas_mortalidad': ('tasas_mortalidad', 'mean'),
+        'tasas_morbilidad': ('tasas_morbilidad', 'mean'),
+    }),
+    'costos_por_centro': (['id_centro_salud'], {
+        'costo_tratamiento': ('costo_tratamiento', 'mean'),
+        'costos_operacion': ('costos_operacion', 'mean'),
+    }),
+    'calidad_por_centro': (['id_centro_salud'], {
+        'tasa_exito_tratamiento': ('tasa_exito_tratamiento', 'mean'),
+        'satisfaccion_paciente': ('satisfaccion_paciente', 'mean'),
+        'tasas_mortalidad': ('tasas_mortalidad', 'mean'),
+        'tasas_morbilidad': ('tasas_morbilidad', 'mean'),
+    }),
+    'cobertura_por_centro': (['id_centro_salud'], {
+        'porcentaje_cubierto': ('porcentaje_cubierto', 'mean'),
+    }),
+    'pacientes_raza_genero': (['id_centro_salud', 'raza', 'genero'], {
+        'pacientes': ('id_centro_salud', 'size'),
+    }),
+    'pacientes_nse_genero': (['id_centro_salud', 'nivel_socioeconomico', 'genero'], {
+        'pacientes': ('id_centro_salud', 'size'),
+    }),
+    'seguimiento_tratamiento_genero': (['tipo_tratamiento', 'genero'], {
+        'seguimiento_enfermedad': ('seguimiento_enfermedad', 'sum'),
+    }),
+    'eventos_raza_genero': (['raza', 'genero'], {
+        'eventos_adversos': ('eventos_adversos', 'sum'),
+        'reclamaciones_responsabilidad_medica': ('reclamaciones_responsabilidad_medica', 'sum'),
+    }),
+    'enfermedades_cronicas': (['enfermedades_cronicas'], {
+        'pacientes': ('enfermedades_cronicas', 'size'),
+    }),
+    'medicamentos_tratamiento': (['tipo_tratamiento', 'medicamentos_recetados'], {
+        'pacientes': ('tipo_tratamiento', 'size'),
+    }),
+    'pacientes_nse': (['nivel_socioeconomico'], {
+        'pacientes': ('nivel_socioeconomico', 'size'),
+    }),
+    'pacientes_idioma': (['idioma'], {
+        'pacientes': ('idioma', 'size'),
+    }),
+    'pacientes_tratamiento': (['tipo_tratamiento'], {
+        'pacientes': ('tipo_tratamiento', 'size'),
+    }),
+    'indicadores_tratamiento': (['tipo_tratamiento'], {
+        column: (column, 'mean') for column in RATE_COLUMNS
+    }),
+    'facturacion_procedimiento': (['procedimientos_realizados'], {
+        'facturacion': ('facturacion', 'sum'),
+        'pago_seguros': ('pago_seguros', 'sum'),
+    }),
+    # Base diaria de las series temporales; semanas y meses se derivan en timeseries.py
+    'serie_diaria': (['fecha_visita'], {
+        'visitas': ('fecha_visita', 'size'),
+        'ensayos_clinicos': ('ensayos_clinicos', 'sum'),
+        'publicaciones_cientificas': ('publicaciones_cientificas', 'sum'),
+        'descubrimientos_medicos': ('descubrimientos_medicos', 'sum'),
+        'eventos_adversos': ('eventos_adversos', 'sum'),
+        'reclamaciones_responsabilidad_medica': ('reclamaciones_responsabilidad_medica', 'sum'),
+    }),
+    'duracion_diaria': (['fecha_visita'], {
+        'visitas': ('fecha_visita', 'size'),
+        'duracion_visita': ('duracion_visita', 'sum'),
+    }),
+}
+
+# Dimensiones del desplegable de dash_app.py y sus resúmenes precalculados
+DIMENSIONS = ['genero', 'raza', 'nivel_socioeconomico']
+
+DIMENSION_AGGREGATIONS = {}
+for _dimension in DIMENSIONS:
+    DIMENSION_AGGREGATIONS[f'satisfaccion_{_dimension}'] = ([_dimension], {
+        'satisfaccion_paciente': ('satisfaccion_paciente', 'mean'),
+        'pacientes': ('satisfaccion_paciente', 'size'),
+    })
+    DIMENSION_AGGREGATIONS[f'exito_edad_{_dimension}'] = (['edad', _dimension], {
+        'tasa_exito_tratamiento': ('tasa_exito_tratamiento', 'mean'),
+        'pacientes': ('tasa_exito_tratamiento', 'size'),
+    })
+
+
+def _derived_columns(data):
+    # Medidas derivadas que antes se agregaban mutando el DataFrame original
+    derived = {}
+    if {'pago_seguros', 'facturacion'} <= set(data.columns):
+        derived['porcentaje_cubierto'] = data['pago_seguros'] / data['facturacion'] * 100
+    return data.assign(**derived) if derived else data
+
+
+def compute_aggregates(data, specs=CHART_AGGREGATIONS):
+    data = _derived_columns(data)
+
+    # Se agrupan las especificaciones por dimensiones: un solo groupby por combinación
+    by_keys = {}
+    for name, (keys, measures) in specs.items():
+        columns = set(keys) | {column for column, _ in measures.values()}
+        if not columns <= set(data.columns):
+            continue
+        by_keys.setdefault(tuple(keys), []).append((name, measures))
+
+    aggregates = {}
+    for keys, charts in by_keys.items():
+        named = {}
+        for name, measures in charts:
+            for output, (column, func) in measures.items():
+                named[f"{name}__{output}"] = pd.NamedAgg(column=column, aggfunc=func)
+        grouped = data.groupby(list(keys), observed=True).agg(**named).reset_index()
+
+        for name, measures in charts:
+            table = grouped[list(keys) + [f"{name}__{output}" for output in measures]]
+            aggregates[name] = table.rename(columns={f"{name}__{output}": output for output in measures})
+    return aggregates
+
+
+# Piezas sumables de cada función: un promedio se guarda como suma y conteo
+PARTIAL_PARTS = {
+    'sum': ['sum'],
+    'size': ['size'],
+    'mean': ['sum', 'count'],
+    'min': ['min'],
+    'max': ['max'],
+}
+
+# Cómo se combinan dos piezas del mismo grupo
+MERGE_PARTS = {'sum': 'sum', 'size': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def partial_aggregates(data, specs=CHART_AGGREGATIONS):
+    # Igual que compute_aggregates, pero con piezas que se pueden fusionar entre bloques de filas
+    data = _derived_columns(data)
+
+    partials = {}
+    for name, (keys, measures) in specs.items():
+        columns = set(keys) | {column for column, _ in measures.values()}
+        if not columns <= set(data.columns):
+            continue
+        named = {}
+        for output, (column, func) in measures.items():
+            for part in PARTIAL_PARTS[func]:
+                named[f"{output}__{part}"] = pd.NamedAgg(column=column, aggfunc=part)
+        partials[name] = data.groupby(list(keys), observed=True).agg(**named)
+    return partials
+
+
+def merge_partials(left, right):
+    merged = dict(left)
+    for name, table in right.items():
+        if name not in merged:
+            merged[name] = table
+            continue
+        combined = pd.concat([merged[name], table])
+        how = {column: MERGE_PARTS[column.rsplit('__', 1)[1]] for column in combined.columns}
+        merged[name] = combined.groupby(level=list(range(combined.index.nlevels)), observed=True).agg(how)
+    return merged
+
+
+def finalize_partials(partials, specs=CHART_AGGREGATIONS):
+    # Convierte las piezas en las mismas tablas que devuelve compute_aggregates
+    aggregates = {}
+    for name, table in partials.items():
+        keys, measures = specs[name]
+        outputs = {}
+        for output, (column, func) in measures.items():
+            if func == 'mean':
+                outputs[output] = table[f"{output}__sum"] / table[f"{output}__count"]
+            else:
+                outputs[output] = table[f"{output}__{func}"]
+        aggregates[name] = pd.DataFrame(outputs, index=table.index).reset_index()
+    return aggregates
+
+
+def pathway_links(data, stages=PATHWAY_STAGES, max_links=30, min_share=0.0, weights=None):
+    # weights: columna con el número de pacientes de cada fila, cuando data ya son trayectorias contadas
+    categories = []
+    codes = {}
+    for stage in stages:
+        column = data[stage]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        categories.append(column.cat.categories.astype(str))
+        codes[stage] = column.cat.codes
+    codes = pd.DataFrame(codes)
+    if weights is not None:
+        codes['_peso'] = data[weights]
+    codes = codes[(codes[stages] >= 0).all(axis=1)]
+
+    # Un solo groupby sobre los códigos de todas las etapas; cada salto se suma desde las trayectorias
+    paths = codes.groupby(stages).size() if weights is None else codes.groupby(stages)['_peso'].sum()
+
+    offsets = np.concatenate([[0], np.cumsum([len(c) for c in categories])[:-1]])
+    sources, targets, values = [], [], []
+    for i, (first, second) in enumerate(zip(stages, stages[1:])):
+        hop = paths.groupby(level=[first, second]).sum()
+        # Poda: los max_links enlaces más pesados de cada salto con al menos min_share del flujo
+        hop = hop[hop >= min_share * hop.sum()].nlargest(max_links)
+        sources.append(hop.index.get_level_values(0).to_numpy() + offsets[i])
+        targets.append(hop.index.get_level_values(1).to_numpy() + offsets[i + 1])
+        values.append(hop.to_numpy())
+    sources, targets, values = np.concatenate(sources), np.concatenate(targets), np.concatenate(values)
+
+    # Solo se conservan los nodos que siguen conectados tras la poda
+    labels = np.concatenate([np.asarray(c) for c in categories])
+    node_stage = np.repeat(np.arange(len(stages)), [len(c) for c in categories])
+    used = np.unique(np.concatenate([sources, targets]))
+    remap = np.full(len(labels), -1)
+    remap[used] = np.arange(len(used))
+
+    return {
+        'label': labels[used].tolist(),
+        'stage': node_stage[used].tolist(),
+        'source': remap[sources].tolist(),
+        'target': remap[targets].tolist(),
+        'value': values.tolist(),
+    }
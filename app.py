@@ -1,18 +1,25 @@
+import os
+from contextlib import nullcontext
+
+import numpy as np
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objs as go
-import networkx as nx
-from pyvis.network import Network
-import json
-import requests
-import folium
-from folium.plugins import MarkerCluster
 import streamlit.components.v1 as components
-from scipy.cluster.hierarchy import dendrogram, linkage
-from sklearn.preprocessing import OrdinalEncoder
+
+import geo_store
+from aggregations import PATHWAY_STAGES, pathway_links
+from charts import STREAMING_CHARTS, choropleth_map, create_marker_map, sankey_chart
+from data_loader import dataset_fingerprint, dataset_format, read_dataset
+from figure_cache import FIGURES, cached_figure, figure_key
+from filters import FILTER_COLUMNS, FILTER_LABELS, build_filter_index, filter_mask, selection_key
+from sampling import DEFAULT_POINT_BUDGET
+from kpis import KPI_LABELS, KPI_RANGE_LABELS, build_kpi_index, kpi_range, last_date, period_kpis
+from query_backend import available_backends, run_aggregates
+from profiling import ChartProfiler
+from search import build_search_index, lookup_patient, search
+from segmentation import DEFAULT_SEGMENTS, SEGMENT_COLUMNS, segment_patients
+from streaming import STREAMING_THRESHOLD_BYTES, stream_csv
+from timeseries import GRAIN_LABELS
 
 st.set_page_config(layout="wide")
 locations_lima = [
@@ -37,495 +44,504 @@ locations_provinces = [
         {'city': 'Tacna', 'latitude': -18.0056, 'longitude': -70.2463},
     ]
 
+# Directorio del servidor desde el que se pueden abrir archivos por ruta; fuera de él no se lee nada
+SERVER_DATA_DIR = os.environ.get("DATOS_SERVIDOR", "datos")
+
+# Columnas que lee cada panel; None carga el dataset completo
+PANEL_COLUMNS = {
+    "Información general": None,
+    "Análisis financiero": (
+        'facturacion', 'pago_seguros', 'costo_tratamiento', 'costos_operacion',
+        'id_centro_salud', 'procedimientos_realizados', 'tasa_exito_tratamiento',
+    ),
+    "Análisis de calidad": (
+        'tipo_tratamiento', 'id_centro_salud', 'genero', 'fecha_visita',
+        'satisfaccion_paciente', 'tasas_mortalidad', 'tasas_morbilidad',
+        'tasa_exito_tratamiento', 'costo_tratamiento', 'seguridad_paciente',
+        'ensayos_clinicos', 'publicaciones_cientificas', 'descubrimientos_medicos',
+        'eventos_adversos', 'reclamaciones_responsabilidad_medica',
+        *PATHWAY_STAGES,
+    ),
+    "Segmentación de pacientes": SEGMENT_COLUMNS,
+}
+
 
+@st.cache_data(show_spinner=False)
+def load_geojson_data(cities, tolerance='media'):
+    # Polígonos simplificados desde el almacén local; sin peticiones de red
+    return geo_store.features_for(cities, tolerance)
 
 
-def create_marker_map(locations_lima, locations_provinces, data):
-    m = folium.Map(location=[-9.189967, -75.015152], zoom_start=6)
-
-    marker_cluster_lima = MarkerCluster().add_to(m)
-    marker_cluster_provinces = MarkerCluster().add_to(m)
-
-    for location in locations_lima:
-        city_data = data[data['ubicacion_geografica'] == location['city']]
-        for _, patient in city_data.iterrows():
-            folium.Marker(
-                location=[location['latitude'], location['longitude']],
-                popup=f"Paciente ID: {patient['id_paciente']}",
-                icon=None,
-            ).add_to(marker_cluster_lima)
-
-    for location in locations_provinces:
-        city_data = data[data['ubicacion_geografica'] == location['city']]
-        for _, patient in city_data.iterrows():
-            folium.Marker(
-                location=[location['latitude'], location['longitude']],
-                popup=f"Paciente ID: {patient['id_paciente']}",
-                icon=None,
-            ).add_to(marker_cluster_provinces)
-
-    # Guardar el mapa en un archivo HTML
-    m.save("marker_map.html")
-
-def sankey_chart(data):
-    source = data['diagnosticos_previos'].value_counts().index.tolist()
-    target = data['tratamientos_ant'].value_counts().index.tolist()
-    label = source + target
-
-    source_indices = data['diagnosticos_previos'].apply(lambda x: source.index(x))
-    target_indices = data['tratamientos_ant'].apply(lambda x: target.index(x) + len(source))
-    value_counts = data.groupby([source_indices, target_indices]).size().reset_index(name='value')
-
-    fig = go.Figure(go.Sankey(
-        node=dict(
-            pad=15,
-            thickness=20,
-            line=dict(color="black", width=0.5),
-            label=label,
-            color="blue"
-        ),
-        link=dict(
-            source=value_counts[source_indices.name].values,
-            target=value_counts[target_indices.name].values,
-            value=value_counts['value'].values
-        )
-    ))
-
-    fig.update_layout(title_text="Diagnósticos previos a tipos de tratamiento", font_size=10)
-    st.plotly_chart(fig)
-
-def load_geojson_data(url):
-    response = requests.get(url)
-    return json.loads(response.text)
-
-def choropleth_map(data, geojson_data):
-    # Contar el número de pacientes por ciudad
-    city_counts = data['ubicacion_geografica'].value_counts().reset_index()
-    city_counts.columns = ['city', 'count']
-
-    # Crear el mapa coroplético
-    fig = px.choropleth(city_counts,
-                        geojson=geojson_data,
-                        locations='city',
-                        featureidkey='properties.name',
-                        color='count',
-                        color_continuous_scale="Viridis",
-                        labels={'count': 'Número de pacientes'},
-                        title="Pacientes por ciudad")
-    fig.update_geos(showcountries=True, showcoastlines=True, showland=True, fitbounds="locations")
-    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-    st.plotly_chart(fig)
+@st.cache_data(show_spinner="Cargando datos...")
+def load_data(digest, fmt, columns, _raw):
+    # La clave de caché es la huella del contenido más la proyección de columnas del panel
+    return read_dataset(_raw, fmt, columns)
 
 
+@st.cache_data(show_spinner=False)
+def load_aggregates(digest, fmt, columns, backend, _raw):
+    # Resúmenes de todos los gráficos del panel, calculados una vez por dataset y motor
+    if backend != 'pandas' and fmt == 'parquet' and isinstance(_raw, str):
+        # El motor embebido lee el Parquet del servidor directamente, sin pasar por pandas
+        return run_aggregates(_raw, backend=backend)
+    return run_aggregates(load_data(digest, fmt, columns, _raw), backend=backend)
+
+
+@st.cache_resource(show_spinner=False)
+def load_filter_index(digest, fmt, _raw):
+    # Mapas de bits por valor de las columnas filtrables, uno por dataset y compartido por todos los paneles
+    return build_filter_index(load_data(digest, fmt, tuple(FILTER_COLUMNS), _raw))
+
+
+@st.cache_data(show_spinner="Aplicando filtros...")
+def load_filtered(digest, fmt, columns, backend, selection, _raw):
+    # Subconjunto filtrado y sus agregados; las filas de cualquier proyección siguen el orden del archivo
+    data = load_data(digest, fmt, columns, _raw)
+    mask = filter_mask(load_filter_index(digest, fmt, _raw), selection)
+    data = data[mask].reset_index(drop=True)
+    return data, run_aggregates(data, backend=backend)
+
+
+@st.cache_data(show_spinner=False)
+def load_streamed(digest, fmt, columns, _raw):
+    # Recorrido por bloques: agregados fusionables, cuantiles aproximados y una muestra acotada
+    bar = st.progress(0.0, "Procesando el archivo por bloques...")
+    summary = stream_csv(_raw, columns, progress=lambda rows, done: bar.progress(done, f"{rows:,} filas procesadas"))
+    bar.empty()
+    return summary
+
+
+@st.cache_data(show_spinner=False)
+def load_pathways(digest, fmt, columns, max_links, _data, weights=None):
+    return pathway_links(_data, PATHWAY_STAGES, max_links, weights=weights)
+
+
+def profiled(profiler, chart_id, stage):
+    # Con el modo de perfilado desactivado no se mide nada
+    return nullcontext({}) if profiler is None else profiler.stage(chart_id, stage)
+
+
+def serialized(profiler, chart_id, figure):
+    if profiler is not None:
+        profiler.serialize(chart_id, figure)
+    return figure
+
+
+@st.fragment
+def pathway_chart(data, aggs, view):
+    max_links = st.slider("Enlaces por etapa", 5, 100, 30, 5)
+    with profiled(view.get('profiler'), 'trayectorias', 'preparacion'):
+        if 'trayectorias' in aggs:
+            # Trayectorias ya contadas durante el recorrido por bloques
+            links = load_pathways(*view['dataset_key'], max_links, aggs['trayectorias'], 'pacientes')
+        else:
+            links = load_pathways(*view['dataset_key'], max_links, data)
+    with profiled(view.get('profiler'), 'trayectorias', 'construccion'):
+        fig = sankey_chart(links)
+    st.plotly_chart(serialized(view.get('profiler'), 'trayectorias', fig))
+
+
+@st.cache_resource(show_spinner=False)
+def load_search_index(digest, fmt, columns, _data):
+    # Índices de solo lectura: se comparten entre sesiones sin copiarlos en cada ejecución
+    return build_search_index(_data)
+
+
+@st.cache_resource(show_spinner=False)
+def load_kpi_index(digest, fmt, columns, _data):
+    # Sumas acumuladas por día: cada ventana de indicadores se responde con dos búsquedas binarias
+    return build_kpi_index(_data)
+
+
+@st.cache_resource(show_spinner="Segmentando pacientes...")
+def load_segments(digest, fmt, columns, segments, _data):
+    # Modelo ajustado y etiquetas por dataset y número de segmentos; volver a una k ya vista es inmediato
+    return segment_patients(_data, segments)
+
+
+@st.cache_data(show_spinner="Construyendo mapa...")
+def load_marker_map(digest, fmt, columns, _data):
+    return create_marker_map(locations_lima, locations_provinces, _data)
+
+
+@st.fragment
+def column_viewer(data):
+    selected_columns = st.multiselect("Selecciona las columnas que deseas visualizar", data.columns)
+    if len(selected_columns) > 0:
+        st.dataframe(data[selected_columns])
+
+
+@st.fragment
+def patient_search(data, index):
+    st.header("Buscar paciente por ID")
+    patient_id = st.text_input("Introduce el ID del paciente", "")
+    if patient_id != "":
+        try:
+            patient_data = data.iloc[lookup_patient(index, int(patient_id))]
+            if len(patient_data) > 0:
+                st.write("Datos del paciente con ID:", patient_id)
+                st.dataframe(patient_data)
+            else:
+                st.warning("No se encontró un paciente con el ID proporcionado.")
+        except ValueError:
+            st.warning("Por favor, introduce un ID de paciente válido (número entero).")
+
+
+@st.fragment
+def patient_filter_search(data, index):
+    st.header("Búsqueda avanzada de pacientes")
+    col1, col2 = st.columns(2)
+    categories = {}
+    ranges = {}
+    with col1:
+        if 'genero' in index['inverted']:
+            categories['genero'] = st.multiselect("Género", list(index['inverted']['genero']['codes']))
+        if 'ubicacion_geografica' in index['inverted']:
+            categories['ubicacion_geografica'] = st.multiselect("Ubicación", list(index['inverted']['ubicacion_geografica']['codes']))
+    with col2:
+        if 'edad' in index['range']:
+            ages = index['range']['edad']['values']
+            ranges['edad'] = st.slider("Edad", int(ages[0]), int(ages[-1]), (int(ages[0]), int(ages[-1])))
+        if 'fecha_visita' in index['range']:
+            dates = index['range']['fecha_visita']['values']
+            last = pd.Timestamp(dates[-1]).date()
+            period = st.date_input("Fecha de visita", (last - pd.Timedelta(days=30), last))
+            if len(period) == 2:
+                ranges['fecha_visita'] = (np.datetime64(period[0]), np.datetime64(period[1]) + np.timedelta64(1, 'D') - np.timedelta64(1, 'us'))
+
+    rows = search(index, categories, ranges)
+    st.write(f"{len(rows)} visitas encontradas")
+    st.dataframe(data.iloc[rows[:1000]])
+
+
+def show(chart_id, data, aggs, view, **filters):
+    # Punto único por el que pasa cada gráfico de los paneles; las vistas repetidas salen del LRU del proceso
+    if view.get('streaming'):
+        chart_id = STREAMING_CHARTS.get(chart_id, chart_id)
+    with profiled(view.get('profiler'), chart_id, 'construccion') as event:
+        event['cache'] = figure_key(view['dataset_key'], chart_id, view['point_budget'], **filters) in FIGURES
+        fig = cached_figure(view['dataset_key'], chart_id, data, aggs, view['point_budget'], **filters)
+    st.plotly_chart(serialized(view.get('profiler'), chart_id, fig))
+
+
+@st.fragment
+def race_gender_chart(data, aggs, view):
+    st.header("Pacientes por raza y género en cada centro de salud")
+    race_filter = st.multiselect('Selecciona las razas a mostrar:', data['raza'].unique().tolist())
+    show('pacientes_raza_genero', data, aggs, view, race_filter=race_filter)
+
+
+@st.fragment
+def age_by_procedure_chart(data, aggs, view):
+    st.header("Comparación de edad de pacientes según tipo de tratamiento y género")
+    treatment_filter = st.multiselect('Selecciona los tratamientos a mostrar:', data['procedimientos_realizados'].unique().tolist())
+    show('edad_procedimiento', data, aggs, view, treatment_filter=treatment_filter)
+
+
+@st.fragment
+def trend_charts(data, aggs, view, chart_ids, key):
+    # Granularidad y ventana móvil compartidas por las tendencias de la sección
+    col1, col2 = st.columns(2)
+    grain = col1.radio("Granularidad", list(GRAIN_LABELS), format_func=GRAIN_LABELS.get, horizontal=True, key=f"{key}_granularidad")
+    window = col2.slider("Ventana móvil (periodos)", 1, 30, 1, key=f"{key}_ventana")
+    for chart_id in chart_ids:
+        show(chart_id, data, aggs, view, grain=grain, window=window)
+
+
+@st.fragment
+def kpi_tiles(index):
+    groups = sorted(index['groups'])
+    group = st.selectbox("Centro de salud", [None, *groups], format_func=lambda g: "Todos" if g is None else f"Centro {g}")
+
+    for period, label in [('semana', "esta semana"), ('mes', "este mes")]:
+        columns = st.columns(len(index['columns']))
+        for col, (name, (current, _, delta)) in zip(columns, period_kpis(index, period, group=group).items()):
+            col.metric(f"{KPI_LABELS[name]} {label}", f"{current:,.0f}", None if delta is None else f"{delta:+.1%}")
+
+    with st.expander("Rango personalizado"):
+        last = last_date(index)
+        period = st.date_input("Periodo", (last - pd.Timedelta(days=29), last), key="kpi_rango")
+        if len(period) == 2:
+            columns = st.columns(len(index['columns']))
+            values = kpi_range(index, period[0], period[1], group)
+            for col, name in zip(columns, index['columns']):
+                col.metric(KPI_RANGE_LABELS[name], f"{values[name]:,.0f}")
+
+
+def render_records(data, aggs, view):
+    st.subheader("Registros")
+    st.dataframe(data.head(100))
+    if 'fecha_visita' in data.columns:
+        kpi_tiles(load_kpi_index(*view['dataset_key'], data))
+    column_viewer(data)
+    index = load_search_index(*view['dataset_key'], data)
+    patient_search(data, index)
+    patient_filter_search(data, index)
+
+
+def render_map(data, aggs, view):
+    # Crear el mapa con marcadores (cacheado por dataset); folium entrega el HTML ya serializado
+    with profiled(view.get('profiler'), 'mapa_marcadores', 'construccion') as event:
+        html_string = load_marker_map(*view['dataset_key'], data)
+        event['bytes'] = len(html_string.encode('utf-8'))
+    components.html(html_string, width=900, height=600)
+
+    if not geo_store.available_levels():
+        st.info("No hay límites GeoJSON locales. Descárgalos una vez con: python geo_store.py distritos <url>")
+        return
+    tolerance = st.select_slider("Detalle de los polígonos", options=["baja", "media", "alta"], value="media")
+    cities = tuple(data['ubicacion_geografica'].dropna().unique().tolist())
+    with profiled(view.get('profiler'), 'mapa_coropletico', 'preparacion'):
+        geojson_data = load_geojson_data(cities, tolerance)
+    with profiled(view.get('profiler'), 'mapa_coropletico', 'construccion'):
+        fig = choropleth_map(data, geojson_data)
+    st.plotly_chart(serialized(view.get('profiler'), 'mapa_coropletico', fig))
+
+
+def render_demographics(data, aggs, view):
+    co1, co2 = st.columns(2, gap='small')
+
+    with co1:
+        show('ubicacion_genero', data, aggs, view)
+        race_gender_chart(data, aggs, view)
+        show('pacientes_nse_genero', data, aggs, view)
+
+    with co2:
+        show('pacientes_nse', data, aggs, view)
+        show('pacientes_idioma', data, aggs, view)
+        show('pacientes_tratamiento', data, aggs, view)
+        show('densidad_pacientes', data, aggs, view)
+
+
+def render_treatments(data, aggs, view):
+    co1, co2 = st.columns(2, gap='small')
+
+    with co1:
+        age_by_procedure_chart(data, aggs, view)
+        show('duracion_procedimiento', data, aggs, view)
+        show('seguimiento_tratamiento', data, aggs, view)
+        show('medicamentos_tratamiento', data, aggs, view)
+
+    with co2:
+        show('enfermedades_cronicas', data, aggs, view)
+        show('duracion_tratamiento_caja', data, aggs, view)
+        show('duracion_tratamiento_violin', data, aggs, view)
+        show('satisfaccion_tratamiento', data, aggs, view)
+        show('satisfaccion_nse', data, aggs, view)
+
+
+def render_costs(data, aggs, view):
+    co1, co2 = st.columns(2, gap='small')
+
+    with co1:
+        show('tasas_centro', data, aggs, view)
+        show('costos_centro', data, aggs, view)
+        show('eventos_raza_genero', data, aggs, view)
+        show('costo_tratamiento_centro', data, aggs, view)
+        show('costos_operacion_centro', data, aggs, view)
+
+    with co2:
+        show('analisis_costos', data, aggs, view)
+        trend_charts(data, aggs, view, ['duracion_temporal'], key="tendencia_duracion")
+
+
+# Secciones del panel "Información general"; solo se calcula la pestaña abierta
+GENERAL_SECTIONS = {
+    "Registros": render_records,
+    "Mapa": render_map,
+    "Demografía": render_demographics,
+    "Tratamientos": render_treatments,
+    "Costos y calidad": render_costs,
+}
+
+
+def render_general_panel(data, aggs, view):
+    st.header("Información general")
+    tabs = st.tabs(list(GENERAL_SECTIONS), key="secciones_generales", on_change="rerun")
+    for tab, render in zip(tabs, GENERAL_SECTIONS.values()):
+        if tab.open:
+            with tab:
+                render(data, aggs, view)
+
+
+def render_financial_panel(data, aggs, view):
+    st.header("Análisis financiero")
+
+    fin1, fin2 = st.columns(2)
+    with fin1:
+        for chart_id in ['facturacion_centro', 'facturacion_costo', 'costo_promedio_centro', 'costo_exito', 'cobertura_centro', 'costo_operacion_centro']:
+            show(chart_id, data, aggs, view)
+
+    with fin2:
+        show('ingresos_procedimiento', data, aggs, view)
+        show('pagos_seguros_procedimiento', data, aggs, view)
+
+
+def render_quality_panel(data, aggs, view):
+    st.header("Análisis de calidad")
+
+    cal1, cal2 = st.columns(2)
+    with cal1:
+        for chart_id in ['indicadores_tratamiento', 'exito_centro', 'costo_exito_satisfaccion']:
+            show(chart_id, data, aggs, view)
+        trend_charts(data, aggs, view, ['tendencia_investigacion', 'tendencia_eventos'], key="tendencias_calidad")
+
+    with cal2:
+        for chart_id in ['satisfaccion_seguridad', 'exito_tratamiento', 'satisfaccion_centro', 'morbilidad_centro', 'mortalidad_centro']:
+            show(chart_id, data, aggs, view)
+
+    st.header("Trayectorias asistenciales")
+    pathway_chart(data, aggs, view)
+
+
+@st.fragment
+def render_segmentation_panel(data, aggs, view):
+    st.header("Segmentación de pacientes")
+    if len(data) < 2:
+        st.info("Se necesitan al menos dos pacientes para segmentar.")
+        return
+    segments = st.slider("Número de segmentos", 2, min(20, len(data)), min(DEFAULT_SEGMENTS, len(data)))
+    with profiled(view.get('profiler'), 'segmentos', 'preparacion'):
+        result = load_segments(*view['dataset_key'], segments, data)
+    aggs = {**aggs, f'segmentos_{segments}': result}
+
+    seg1, seg2 = st.columns(2)
+    with seg1:
+        show('segmentos_tamano', data, aggs, view, segments=segments)
+        show('segmentos_dendrograma', data, aggs, view, segments=segments)
+    with seg2:
+        show('segmentos_perfil', data, aggs, view, segments=segments)
+        show('segmentos_dispersion', data, aggs, view, segments=segments)
+    st.dataframe(result['perfil'].round(2), hide_index=True)
+
+
+PANELS = {
+    "Información general": render_general_panel,
+    "Análisis financiero": render_financial_panel,
+    "Análisis de calidad": render_quality_panel,
+    "Segmentación de pacientes": render_segmentation_panel,
+}
+
+
+# Paneles que pueden dibujarse solo con agregados cuando el archivo no cabe en memoria
+STREAMING_PANELS = ("Análisis financiero", "Análisis de calidad")
+
+
+def global_filters(index):
+    # Filtros de la barra lateral; una selección vacía no filtra esa columna
+    selection = {}
+    with st.sidebar.expander("Filtros globales"):
+        if index['dates'] is not None:
+            bins = index['dates']['bins']
+            first, last = bins[0].astype('datetime64[D]'), (bins[-1] + 1).astype('datetime64[D]') - 1
+            first, last = pd.Timestamp(first).date(), pd.Timestamp(last).date()
+            period = st.date_input(FILTER_LABELS['fecha_visita'], (first, last), min_value=first, max_value=last, key="filtro_fecha_visita")
+            if len(period) == 2 and tuple(period) != (first, last):
+                selection['fecha_visita'] = tuple(period)
+        for column, values in index['values'].items():
+            chosen = st.multiselect(FILTER_LABELS[column], values, key=f"filtro_{column}")
+            if chosen:
+                selection[column] = chosen
+    return selection
+
+
+def server_file(path, data_dir=SERVER_DATA_DIR):
+    # Solo se leen archivos dentro del directorio de datos; realpath resuelve '..' y enlaces simbólicos
+    root = os.path.realpath(data_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if not resolved.startswith(root + os.sep):
+        raise ValueError(f"Solo se pueden abrir archivos dentro de {root}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"No existe el archivo {path}")
+    dataset_format(resolved)
+    return resolved
+
+
+def dataset_source(uploaded_file, server_path):
+    # (origen, nombre, tamaño en bytes, huella); un archivo del servidor no se copia en memoria
+    if uploaded_file is not None:
+        raw = uploaded_file.getvalue()
+        return raw, uploaded_file.name, len(raw), dataset_fingerprint(raw)
+    if server_path:
+        path = server_file(server_path)
+        stat = os.stat(path)
+        return path, path, stat.st_size, f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+    return None
 
 
 def main():
 
     st.sidebar.image('logo.png')
-    uploaded_file = st.sidebar.file_uploader("Selecciona un archivo CSV", type="csv")
+    uploaded_file = st.sidebar.file_uploader("Selecciona un archivo CSV, Parquet o Arrow", type=["csv", "parquet", "arrow", "feather"])
+    server_path = ""
+    if os.path.isdir(SERVER_DATA_DIR):
+        server_path = st.sidebar.text_input(f"O escribe la ruta de un archivo en {SERVER_DATA_DIR}", "")
+
+    try:
+        source = dataset_source(uploaded_file, server_path)
+        fmt = dataset_format(source[1]) if source is not None else None
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if source is not None:
+        raw, name, size, digest = source
 
-    if uploaded_file is not None:
-        data = pd.read_csv(uploaded_file)
-        tophead=data.head(100)
         # Crear paneles
-        panel = st.sidebar.radio("Selecciona un panel:", ["Información general", "Análisis financiero", "Análisis de calidad"])
-
-        if panel == "Información general":
-            # Código para generar gráficos y mostrar información en el panel "Información general"
-            st.header("Información general")
-            st.subheader("Registros")
-            st.dataframe(tophead)
-            col1, col2 = st.columns(2)
-            col1.metric("Pacientes esta semana", "426", "-2%")
-            col2.metric("Pacientes este mes", "1710", "+8%")
-            selected_columns = st.multiselect("Selecciona las columnas que deseas visualizar", data.columns)
-            if len(selected_columns) > 0:
-                st.dataframe(data[selected_columns])
-
-            st.header("Buscar paciente por ID")
-            patient_id = st.text_input("Introduce el ID del paciente", "")
-            if patient_id != "":
-                try:
-                    patient_data = data[data['id_paciente'] == int(patient_id)]
-                    if len(patient_data) > 0:
-                        st.write("Datos del paciente con ID:", patient_id)
-                        st.dataframe(patient_data)
-                    else:
-                        st.warning("No se encontró un paciente con el ID proporcionado.")
-                except ValueError:
-                    st.warning("Por favor, introduce un ID de paciente válido (número entero).")
-
-
-            # Crear el mapa con marcadores
-            create_marker_map(locations_lima, locations_provinces, data)
-
-            # Incrustar el archivo HTML en Streamlit
-            with open("marker_map.html", "r") as f:
-                html_string = f.read()
-            components.html(html_string, width=900, height=600)
-            
-            
-            co1, co2 = st.columns(2,gap='small')
-            
-            with co1:
-                # Gráfico de dispersión con ubicación geográfica de pacientes
-                scatter_plot = px.scatter(
-                    data,
-                    x="latitud",
-                    y="longitud",
-                    color="genero",
-                    hover_data=["ubicacion_geografica", "nivel_socioeconomico"],
-                    title="Ubicación geográfica de pacientes por género",
-                    color_discrete_sequence=["red", "blue"],
-                )
-                st.plotly_chart(scatter_plot)
-
-                st.header("Pacientes por raza y género en cada centro de salud")
-                race_filter = st.multiselect('Selecciona las razas a mostrar:', data['raza'].unique())
-                if not race_filter:
-                    race_filter = data['raza'].unique()
-
-                stacked_bar = data[data['raza'].isin(race_filter)].groupby(['id_centro_salud', 'raza', 'genero']).size().unstack().reset_index().melt(id_vars=['id_centro_salud', 'raza'])
-                stacked_bar_fig = px.bar(stacked_bar, x='id_centro_salud', y='value', color='genero', text='value', facet_col='raza', labels={'id_centro_salud': 'Centro de salud', 'value': 'Cantidad de pacientes'}, title="Cantidad de pacientes por raza y género en cada centro de salud")
-                st.plotly_chart(stacked_bar_fig)
-
-                # Gráfico de caja - Comparación de edad de pacientes según tipo de tratamiento y género
-                    
-                st.header("Comparación de edad de pacientes según tipo de tratamiento y género")
-                treatment_filter = st.multiselect('Selecciona los tratamientos a mostrar:', data['procedimientos_realizados'].unique())
-                if not treatment_filter:
-                    treatment_filter = data['procedimientos_realizados'].unique()
-
-                box_plot = px.box(
-                    data[data["procedimientos_realizados"].isin(treatment_filter)],
-                    x="procedimientos_realizados",
-                    y="edad",
-                    color="genero",
-                    hover_data=["id_centro_salud"],
-                    title="Comparación de edad de pacientes por tipo de tratamiento y género",
-                    color_discrete_sequence=["red", "blue"],
-                )
-                st.plotly_chart(box_plot)
-
-
-                # ...
-                # Gráfico de densidad - Distribución de duración de visitas y facturación según el tipo de tratamiento o el centro de salud
-                kde_plot1 = px.histogram(
-                    data,
-                    x="duracion_visita",
-                    color="procedimientos_realizados",
-                    marginal="violin",
-                    nbins=50,
-                    title="Distribución de duración de visitas por tipo de tratamiento",
-                    color_discrete_sequence=px.colors.qualitative.Pastel,
-                )
-                st.plotly_chart(kde_plot1)
-
-                bar_chart = px.bar(data, x='id_centro_salud', y=['tasas_mortalidad', 'tasas_morbilidad'], title='Tasas de mortalidad y morbilidad por centro de salud')
-                st.plotly_chart(bar_chart)
-
-                bar_chart = px.bar(data, x='tipo_tratamiento', y='seguimiento_enfermedad', color='genero', title='Seguimiento de enfermedades por tipo de tratamiento y género')
-                st.plotly_chart(bar_chart)
-
-                stacked_bar = data.groupby(['id_centro_salud', 'nivel_socioeconomico', 'genero']).size().unstack().reset_index().melt(id_vars=['id_centro_salud', 'nivel_socioeconomico'])
-                stacked_bar_fig = px.bar(stacked_bar, x='id_centro_salud', y='value', color='genero', text='value', facet_col='nivel_socioeconomico', labels={'id_centro_salud': 'Centro de salud', 'value': 'Cantidad de pacientes'}, title="Cantidad de pacientes por nivel socioeconómico y género en cada centro de salud")
-                st.plotly_chart(stacked_bar_fig)
-
-                avg_costs = data.groupby('id_centro_salud').agg({'costo_tratamiento': 'mean', 'costos_operacion': 'mean'}).reset_index()
-                bar_chart = px.bar(avg_costs, x='id_centro_salud', y=['costo_tratamiento', 'costos_operacion'], title='Promedio de costos de tratamiento y costos de operación por centro de salud')
-                st.plotly_chart(bar_chart)
-
-                bar_chart = px.bar(data.groupby(['raza', 'genero']).agg({'eventos_adversos': 'sum', 'reclamaciones_responsabilidad_medica': 'sum'}).reset_index(), x='raza', y=['eventos_adversos', 'reclamaciones_responsabilidad_medica'], color='genero', facet_col='genero', title='Eventos adversos y reclamaciones de responsabilidad médica por raza y género')
-                st.plotly_chart(bar_chart)
-
-                treatment_cost_comparison_chart = px.box(
-                    data,
-                    x="id_centro_salud",
-                    y="costo_tratamiento",
-                    title="Comparación de los costos de tratamiento por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "costo_tratamiento": "Costo del tratamiento"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(treatment_cost_comparison_chart)
-
-
-                operation_cost_comparison_chart = px.bar(
-                    data,
-                    x="id_centro_salud",
-                    y="costos_operacion",
-                    title="Comparación de costos de operación por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "costos_operacion": "Costos de operación"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(operation_cost_comparison_chart)
-
-            with co2:
-
-
-
-                #Análisis de costos
-
-                cost_analysis_chart = px.box(
-                data,
-                x="id_centro_salud",
-                y="costo_tratamiento",
-                points="all",
-                title="Análisis de costos por centro de salud",
-                color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(cost_analysis_chart)
-
-
-                #Análisis de tiempo
-                data["fecha_visita"] = pd.to_datetime(data["fecha_visita"]) # Convierte la columna a tipo de fecha
-                time_analysis_chart = px.line(
-                data,
-                x="fecha_visita",
-                y="duracion_visita",
-                title="Tendencias temporales en visitas de seguimiento",
-                color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(time_analysis_chart)
-
-
-                chronic_disease_counts = data['enfermedades_cronicas'].value_counts()
-                bar_chart = px.bar(chronic_disease_counts, x=chronic_disease_counts.index, y='enfermedades_cronicas', title='Enfermedades crónicas más comunes')
-                st.plotly_chart(bar_chart)
-
-
-                box_plot = px.box(data, x='tipo_tratamiento', y='duracion_visita', color='genero', title='Duración de visitas por tipo de tratamiento y género')
-                st.plotly_chart(box_plot)
-
-
-                medications_by_treatment = data.groupby(['tipo_tratamiento', 'medicamentos_recetados']).size().unstack().reset_index().melt(id_vars=['tipo_tratamiento'])
-                stacked_bar_chart = px.bar(medications_by_treatment, x='tipo_tratamiento', y='value', color='medicamentos_recetados', title='Medicamentos recetados por tipo de tratamiento')
-                st.plotly_chart(stacked_bar_chart)
-
-
-                violin_plot = px.violin(data, x='tipo_tratamiento', y='duracion_visita', color='genero', box=True, points="all", title='Distribución de duración de visitas por tipo de tratamiento y género')
-                st.plotly_chart(violin_plot)
-
-                # Gráfico de violín - Distribución de la satisfacción del paciente según el tipo de tratamiento, género y nivel socioeconómico
-                violin_plot1 = px.violin(
-                    data,
-                    x="tipo_tratamiento",
-                    y="satisfaccion_paciente",
-                    box=True,
-                    points="all",
-                    color="genero",
-                    title="Distribución de la satisfacción del paciente por tipo de tratamiento y género",
-                    color_discrete_sequence=["red", "blue"],
-                )
-                st.plotly_chart(violin_plot1)
-
-                violin_plot2 = px.violin(
-                    data,
-                    x="nivel_socioeconomico",
-                    y="satisfaccion_paciente",
-                    box=True,
-                    points="all",
-                    color="genero",
-                    title="Distribución de la satisfacción del paciente por nivel socioeconómico y género",
-                    color_discrete_sequence=["red", "blue"],
-                )
-                st.plotly_chart(violin_plot2)
-
-                socioeconomic_counts = data['nivel_socioeconomico'].value_counts()
-                pie_chart = px.pie(socioeconomic_counts, values='nivel_socioeconomico', names=socioeconomic_counts.index, title='Distribución de pacientes por nivel socioeconómico')
-                st.plotly_chart(pie_chart)
-
-                language_counts = data['idioma'].value_counts()
-                pie_chart = px.pie(language_counts, values='idioma', names=language_counts.index, title='Distribución de pacientes por idioma')
-                st.plotly_chart(pie_chart)
-
-                #Gráfico de pastel - Distribución de pacientes por tipo de tratamiento
-                treatment_counts = data['tipo_tratamiento'].value_counts()
-                pie_chart = px.pie(
-                treatment_counts,
-                values='tipo_tratamiento',
-                names=treatment_counts.index,
-                title='Distribución de pacientes por tipo de tratamiento',
-                color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(pie_chart)
-                
-                density_map = px.density_mapbox(data, lat='latitud', lon='longitud', z='id_paciente', radius=10, zoom=5, mapbox_style='carto-positron', title='Densidad de pacientes por ubicación geográfica')
-                st.plotly_chart(density_map)
-        elif panel == "Análisis financiero":
-            # Código para generar gráficos y mostrar información en el panel "Análisis financiero"
-            st.header("Análisis financiero")
-
-            fin1,fin2=st.columns(2)
-            with fin1:
-
-                kde_plot2 = px.histogram(
-                data,
-                x="facturacion",
-                color="id_centro_salud",
-                marginal="violin",
-                nbins=50,
-                title="Distribución de facturación por centro de salud",
-                color_discrete_sequence=px.colors.qualitative.Pastel,
-                )
-                st.plotly_chart(kde_plot2)
-
-                scatter_plot = px.scatter(data, x='facturacion', y='costo_tratamiento', title='Relación entre facturación y costo del tratamiento')
-                st.plotly_chart(scatter_plot)
-
-                avg_cost_chart = px.bar(
-                data.groupby("id_centro_salud")["costo_tratamiento"].mean().reset_index(),
-                x="id_centro_salud",
-                y="costo_tratamiento",
-                title="Costo promedio del tratamiento por centro de salud",
-                labels={"id_centro_salud": "Centro de salud", "costo_tratamiento": "Costo promedio"}
-                )
-                st.plotly_chart(avg_cost_chart)
-
-
-                scatter_cost_success = px.scatter(
-                    data,
-                    x="costo_tratamiento",
-                    y="tasa_exito_tratamiento",
-                    color="id_centro_salud",
-                    title="Relación entre costo del tratamiento y tasa de éxito",
-                    labels={"costo_tratamiento": "Costo del tratamiento", "tasa_exito_tratamiento": "Tasa de éxito"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(scatter_cost_success)
-
-                data['porcentaje_cubierto'] = (data['pago_seguros'] / data['facturacion']) * 100
-                insurance_coverage_chart = px.histogram(
-                    data,
-                    x="id_centro_salud",
-                    y="porcentaje_cubierto",
-                    histfunc="avg",
-                    title="Porcentaje promedio de facturación cubierta por seguros por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "porcentaje_cubierto": "Porcentaje cubierto"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(insurance_coverage_chart)
-
-                operation_cost_chart = px.bar(
-                    data.groupby("id_centro_salud")["costos_operacion"].mean().reset_index(),
-                    x="id_centro_salud",
-                    y="costos_operacion",
-                    title="Comparación de costos de operación por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "costos_operacion": "Costo de operación"}
-                )
-                st.plotly_chart(operation_cost_chart)
-
-            with fin2:
-                billing_revenue_chart = px.bar(
-                    data.groupby("procedimientos_realizados")["facturacion"].sum().reset_index(),
-                    x="procedimientos_realizados",
-                    y="facturacion",
-                    title="Ingresos por facturación según el tipo de tratamiento",
-                    labels={"procedimiento realizado": "Tipo de tratamiento", "facturacion": "Ingresos por facturación"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(billing_revenue_chart)
-
-                insurance_payments_chart = px.bar(
-                    data.groupby("procedimientos_realizados")["pago_seguros"].sum().reset_index(),
-                    x="procedimientos_realizados",
-                    y="pago_seguros",
-                    title="Pagos de seguros según el tipo de tratamiento",
-                    labels={"procedimiento realizado": "Tipo de tratamiento", "pago_seguros": "Pagos de seguros"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(insurance_payments_chart)
-
-
-
-
-        elif panel == "Análisis de calidad":
-            # Código para generar gráficos y mostrar información en el panel "Análisis de calidad"
-            st.header("Análisis de calidad")
-            cal1,cal2 =st.columns(2)
-            with cal1:
-                #Gráfico de radar - Comparación de indicadores de desempeño por tipo de tratamiento
-                categories = ['satisfaccion_paciente', 'tasas_mortalidad', 'tasas_morbilidad', 'tasa_exito_tratamiento']
-                treatment_types = data['tipo_tratamiento'].unique()
-
-                fig = go.Figure()
-
-                for treatment in treatment_types:
-                    treatment_data = data[data['tipo_tratamiento'] == treatment]
-                    values = [treatment_data[col].mean() for col in categories]
-                    fig.add_trace(go.Scatterpolar(r=values, theta=categories, fill='toself', name=treatment))
-
-                    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=True, title="Comparación de indicadores de desempeño por tipo de tratamiento")
-                    st.plotly_chart(fig)       
-
-                #Comparación de centros de salud
-                
-                center_comparison_chart = px.bar(
-                data,
-                x="id_centro_salud",
-                y="tasa_exito_tratamiento",
-                text="tasa_exito_tratamiento",
-                title="Comparación de centros de salud por tasa de éxito en tratamientos",
-                color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(center_comparison_chart)
-
-
-                scatter_3d = px.scatter_3d(data, x='costo_tratamiento', y='tasa_exito_tratamiento', z='satisfaccion_paciente', color='id_centro_salud', symbol='genero', title='Relación entre costos de tratamiento, tasas de éxito y satisfacción del paciente')
-                st.plotly_chart(scatter_3d)
-
-                data['fecha_visita'] = pd.to_datetime(data['fecha_visita'])
-                trend_data = data.groupby('fecha_visita').agg({'ensayos_clinicos': 'sum', 'publicaciones_cientificas': 'sum', 'descubrimientos_medicos': 'sum'}).reset_index()
-                trend_plot = px.line(trend_data, x='fecha_visita', y=['ensayos_clinicos', 'publicaciones_cientificas', 'descubrimientos_medicos'], title='Tendencias en ensayos clínicos, publicaciones científicas y descubrimientos médicos')
-                st.plotly_chart(trend_plot)
-
-                trend_data = data.groupby('fecha_visita').agg({'eventos_adversos': 'sum', 'reclamaciones_responsabilidad_medica': 'sum'}).reset_index()
-                trend_plot = px.line(trend_data, x='fecha_visita', y=['eventos_adversos', 'reclamaciones_responsabilidad_medica'], title='Tendencias en eventos adversos y reclamaciones de responsabilidad médica')
-                st.plotly_chart(trend_plot)
-
-            with cal2:
-                scatter_plot = px.scatter(data, x='satisfaccion_paciente', y='seguridad_paciente', title='Relación entre satisfacción del paciente y seguridad del paciente')
-                st.plotly_chart(scatter_plot)
-
-                treatment_success_rate_chart = px.bar(
-                    data.groupby("tipo_tratamiento")["tasa_exito_tratamiento"].mean().reset_index(),
-                    x="tipo_tratamiento",
-                    y="tasa_exito_tratamiento",
-                    title="Tasa de éxito del tratamiento por tipo de tratamiento",
-                    labels={"tipo_tratamiento": "Tipo de tratamiento", "tasa_exito_tratamiento": "Tasa de éxito"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(treatment_success_rate_chart)
-
-                patient_satisfaction_chart = px.bar(
-                    data,
-                    x="id_centro_salud",
-                    y="satisfaccion_paciente",
-                    title="Índice de satisfacción del paciente por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "satisfaccion_paciente": "Satisfacción del paciente"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(patient_satisfaction_chart)
-
-                morbidity_rate_chart = px.bar(
-                    data,
-                    x="id_centro_salud",
-                    y="tasas_morbilidad",
-                    title="Tasas de morbilidad por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "tasas_morbilidad": "Tasa de morbilidad"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(morbidity_rate_chart)
-
-                mortality_rate_chart = px.bar(
-                    data,
-                    x="id_centro_salud",
-                    y="tasas_mortalidad",
-                    title="Tasas de mortalidad por centro de salud",
-                    labels={"id_centro_salud": "Centro de salud", "tasas_mortalidad": "Tasa de mortalidad"},
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                st.plotly_chart(mortality_rate_chart)
+        panel = st.sidebar.radio("Selecciona un panel:", list(PANEL_COLUMNS))
+
+        # Máximo de puntos por gráfico; por encima del umbral de filas se rasteriza
+        point_budget = st.sidebar.number_input("Puntos máximos por gráfico", min_value=500, value=DEFAULT_POINT_BUDGET, step=500)
+
+        backends = available_backends()
+        backend = st.sidebar.selectbox("Motor de agregación", backends) if len(backends) > 1 else backends[0]
+
+        streaming = False
+        if fmt == 'csv' and panel in STREAMING_PANELS:
+            streaming = st.sidebar.checkbox("Procesar por bloques (archivos grandes)", value=size > STREAMING_THRESHOLD_BYTES)
+
+        # Modo de diagnóstico: mide cada gráfico y muestra la tabla de costos al final de la barra lateral
+        profiler = None
+        if st.sidebar.toggle("Perfilar gráficos"):
+            profiler = ChartProfiler(memory=st.sidebar.checkbox("Medir memoria (más lento)", value=True))
+        profile_slot = st.sidebar.container()
+
+        try:
+            if streaming:
+                dataset_key = (digest, 'bloques', PANEL_COLUMNS[panel])
+                with profiled(profiler, 'datos', 'preparacion'):
+                    summary = load_streamed(*dataset_key, raw)
+                data, aggs = summary['sample'], summary['aggs']
+                st.sidebar.caption(f"{summary['rows']:,} filas resumidas; dispersión sobre una muestra de {len(data):,}")
+            else:
+                selection = global_filters(load_filter_index(digest, fmt, raw))
+                dataset_key = (digest, fmt, PANEL_COLUMNS[panel])
+                if selection:
+                    with profiled(profiler, 'datos', 'preparacion'):
+                        data, aggs = load_filtered(*dataset_key, backend, selection, raw)
+                    # Las cachés de figuras e índices distinguen el subconjunto por la huella de los filtros
+                    dataset_key = (f"{digest}:{selection_key(selection)}", fmt, PANEL_COLUMNS[panel])
+                    st.sidebar.caption(f"{len(data):,} visitas tras aplicar los filtros")
+                    if data.empty:
+                        st.warning("Ningún registro cumple los filtros seleccionados.")
+                        return
+                else:
+                    with profiled(profiler, 'datos', 'preparacion'):
+                        data = load_data(*dataset_key, raw)
+                    with profiled(profiler, 'agregados', 'preparacion'):
+                        aggs = load_aggregates(*dataset_key, backend, raw)
+        except (ValueError, OSError) as e:
+            # Archivo dañado o con otro esquema: se informa en lugar de mostrar la traza
+            st.error(f"No se pudo leer {name}: {e}")
+            return
+
+        view = {'dataset_key': dataset_key, 'point_budget': point_budget, 'streaming': streaming, 'profiler': profiler}
+        PANELS[panel](data, aggs, view)
+
+        if profiler is not None:
+            with profile_slot:
+                st.dataframe(profiler.table())
+                st.download_button("Descargar traza", profiler.trace(), file_name="traza_graficos.json", mime="application/json")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
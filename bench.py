@@ -0,0 +1,119 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import pandas as pd
+import plotly
+
+import datosgen
+import geo_store
+from aggregations import CHART_AGGREGATIONS, DIMENSION_AGGREGATIONS, PATHWAY_STAGES, compute_aggregates, pathway_links
+from charts import CHARTS, PANEL_CHARTS, choropleth_map, create_marker_map, sankey_chart
+from data_loader import apply_schema
+from payload import compact_figure
+from query_backend import available_backends, run_aggregates
+from sampling import DEFAULT_POINT_BUDGET
+from timeseries import build_rollups
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Última fecha de visita de los datos sintéticos: el mismo informe sea cual sea el día en que se mide
+REFERENCE_DATE = '2024-12-31'
+
+
+def payload_size(result):
+    # Tamaño de lo que viaja al navegador: JSON de la figura o HTML del mapa
+    if isinstance(result, str):
+        return len(result.encode('utf-8'))
+    return len(result.to_json().encode('utf-8'))
+
+
+def measure(func, *args, memory=True, **kwargs):
+    # Primero se mide el tiempo sin tracemalloc, que ralentiza las asignaciones
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    entry = {'segundos': round(time.perf_counter() - start, 4)}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            entry['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return result, entry
+
+
+def measure_chart(func, *args, memory=True, **kwargs):
+    try:
+        result, entry = measure(func, *args, memory=memory, **kwargs)
+        entry['bytes_figura'] = payload_size(result)
+        if not isinstance(result, str):
+            entry['bytes_compacta'] = payload_size(compact_figure(result))
+    except Exception as e:
+        entry = {'error': f"{type(e).__name__}: {e}"}
+    return entry
+
+
+def bench_size(rows, seed, point_budget, memory=True):
+    data = apply_schema(datosgen.generate_dataset(rows, seed, reference_date=REFERENCE_DATE))
+    report = {'filas': rows, 'preparacion': {}, 'graficos': {}}
+
+    aggs, report['preparacion']['agregados'] = measure(compute_aggregates, data, {**CHART_AGGREGATIONS, **DIMENSION_AGGREGATIONS}, memory=memory)
+    aggs.update(build_rollups(aggs))
+    for backend in available_backends():
+        if backend != 'pandas':
+            _, report['preparacion'][f'agregados_{backend}'] = measure(run_aggregates, data, {**CHART_AGGREGATIONS, **DIMENSION_AGGREGATIONS}, backend, memory=memory)
+    links, report['preparacion']['trayectorias'] = measure(pathway_links, data, PATHWAY_STAGES, memory=memory)
+
+    for panel, charts in PANEL_CHARTS.items():
+        for chart_id in charts:
+            entry = measure_chart(CHARTS[chart_id], data, aggs, point_budget, memory=memory)
+            report['graficos'][chart_id] = {'panel': panel, **entry}
+
+    report['graficos']['mapa_marcadores'] = measure_chart(create_marker_map, datosgen.locations_lima, datosgen.locations_provinces, data, memory=memory)
+    report['graficos']['trayectorias'] = measure_chart(sankey_chart, links, memory=memory)
+    if geo_store.available_levels():
+        cities = tuple(data['ubicacion_geografica'].dropna().unique().tolist())
+        geojson_data = geo_store.features_for(cities)
+        report['graficos']['mapa_coropletico'] = measure_chart(choropleth_map, data, geojson_data, memory=memory)
+    else:
+        report['graficos']['mapa_coropletico'] = {'error': "sin límites GeoJSON locales"}
+    return report
+
+
+def run(sizes=SIZES, seed=42, point_budget=DEFAULT_POINT_BUDGET, memory=True):
+    results = []
+    for rows in sizes:
+        start = time.perf_counter()
+        results.append(bench_size(rows, seed, point_budget, memory))
+        print(f"{rows} filas: {time.perf_counter() - start:.1f} s", flush=True)
+    return {
+        'semilla': seed,
+        'fecha_referencia': REFERENCE_DATE,
+        'presupuesto_puntos': point_budget,
+        'entorno': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'plotly': plotly.__version__,
+            'procesador': platform.processor() or platform.machine(),
+        },
+        'resultados': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el tiempo, la memoria y el tamaño de cada gráfico por tamaño de dataset")
+    parser.add_argument("--filas", type=int, nargs='+', default=SIZES)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--puntos", type=int, default=DEFAULT_POINT_BUDGET, help="Presupuesto de puntos por gráfico")
+    parser.add_argument("--sin-memoria", action='store_true', help="Omite la segunda pasada con tracemalloc")
+    parser.add_argument("--salida", default='bench.json')
+    args = parser.parse_args()
+
+    report = run(args.filas, args.semilla, args.puntos, not args.sin_memoria)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Informe guardado en {args.salida}")
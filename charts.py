@@ -0,0 +1,532 @@
+import folium
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objs as go
+from scipy.cluster.hierarchy import dendrogram
+
+from aggregations import PATHWAY_STAGES, RATE_COLUMNS
+from sampling import DEFAULT_POINT_BUDGET, budgeted_histogram, budgeted_scatter, stratified_sample
+from segmentation import DEFAULT_SEGMENTS
+from timeseries import GRAIN_LABELS, rollup
+
+# Constructores de figuras sin dependencias de Streamlit: reciben el dataset, sus
+# agregados y el presupuesto de puntos, y devuelven la figura lista para mostrar.
+
+
+def create_marker_map(locations_lima, locations_provinces, data):
+    m = folium.Map(location=[-9.189967, -75.015152], zoom_start=6)
+
+    # Un marcador por ciudad con el número de pacientes, en lugar de un objeto por paciente
+    city_counts = data['ubicacion_geografica'].value_counts()
+    max_count = max(int(city_counts.max()), 1) if len(city_counts) else 1
+
+    for name, locations in [("Lima", locations_lima), ("Provincias", locations_provinces)]:
+        layer = folium.FeatureGroup(name=name).add_to(m)
+        for location in locations:
+            count = int(city_counts.get(location['city'], 0))
+            if count == 0:
+                continue
+            folium.CircleMarker(
+                location=[location['latitude'], location['longitude']],
+                radius=5 + 25 * (count / max_count) ** 0.5,
+                popup=f"{location['city']}: {count} pacientes",
+                tooltip=location['city'],
+                fill=True,
+                fill_opacity=0.6,
+            ).add_to(layer)
+
+    folium.LayerControl().add_to(m)
+
+    # El HTML se devuelve en memoria, sin pasar por un archivo compartido entre sesiones
+    return m.get_root().render()
+
+def sankey_chart(links, stages=PATHWAY_STAGES):
+    palette = px.colors.qualitative.Pastel
+    fig = go.Figure(go.Sankey(
+        node=dict(
+            pad=15,
+            thickness=20,
+            line=dict(color="black", width=0.5),
+            label=links['label'],
+            color=[palette[stage % len(palette)] for stage in links['stage']]
+        ),
+        link=dict(
+            source=links['source'],
+            target=links['target'],
+            value=links['value']
+        )
+    ))
+
+    fig.update_layout(title_text="Trayectoria asistencial: " + " → ".join(stages), font_size=10)
+    return fig
+
+def choropleth_map(data, geojson_data):
+    # Contar el número de pacientes por ciudad
+    city_counts = data['ubicacion_geografica'].value_counts().reset_index()
+    city_counts.columns = ['city', 'count']
+    city_counts = city_counts[city_counts['count'] > 0]
+
+    # Crear el mapa coroplético
+    fig = px.choropleth(city_counts,
+                        geojson=geojson_data,
+                        locations='city',
+                        featureidkey='id',
+                        color='count',
+                        color_continuous_scale="Viridis",
+                        labels={'count': 'Número de pacientes'},
+                        title="Pacientes por ciudad")
+    fig.update_geos(showcountries=True, showcoastlines=True, showland=True, fitbounds="locations")
+    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
+    return fig
+
+
+# Información general
+
+def location_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    # Gráfico de dispersión con ubicación geográfica de pacientes
+    return budgeted_scatter(
+        data,
+        x="latitud",
+        y="longitud",
+        budget=point_budget,
+        by="genero",
+        color="genero",
+        hover_data=["ubicacion_geografica", "nivel_socioeconomico"],
+        title="Ubicación geográfica de pacientes por género",
+        color_discrete_sequence=["red", "blue"],
+    )
+
+def race_gender_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET, race_filter=None):
+    stacked_bar = aggs['pacientes_raza_genero']
+    if race_filter:
+        stacked_bar = stacked_bar[stacked_bar['raza'].isin(race_filter)]
+    return px.bar(stacked_bar, x='id_centro_salud', y='pacientes', color='genero', text='pacientes', facet_col='raza', labels={'id_centro_salud': 'Centro de salud', 'pacientes': 'Cantidad de pacientes'}, title="Cantidad de pacientes por raza y género en cada centro de salud")
+
+def socioeconomic_gender_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['pacientes_nse_genero'], x='id_centro_salud', y='pacientes', color='genero', text='pacientes', facet_col='nivel_socioeconomico', labels={'id_centro_salud': 'Centro de salud', 'pacientes': 'Cantidad de pacientes'}, title="Cantidad de pacientes por nivel socioeconómico y género en cada centro de salud")
+
+def socioeconomic_pie(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.pie(aggs['pacientes_nse'], values='pacientes', names='nivel_socioeconomico', title='Distribución de pacientes por nivel socioeconómico')
+
+def language_pie(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.pie(aggs['pacientes_idioma'], values='pacientes', names='idioma', title='Distribución de pacientes por idioma')
+
+def treatment_pie(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    #Gráfico de pastel - Distribución de pacientes por tipo de tratamiento
+    return px.pie(
+    aggs['pacientes_tratamiento'],
+    values='pacientes',
+    names='tipo_tratamiento',
+    title='Distribución de pacientes por tipo de tratamiento',
+    color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def density_map(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.density_mapbox(data, lat='latitud', lon='longitud', z='id_paciente', radius=10, zoom=5, mapbox_style='carto-positron', title='Densidad de pacientes por ubicación geográfica')
+
+def age_by_procedure_box(data, aggs, point_budget=DEFAULT_POINT_BUDGET, treatment_filter=None):
+    # Gráfico de caja - Comparación de edad de pacientes según tipo de tratamiento y género
+    if treatment_filter:
+        data = data[data["procedimientos_realizados"].isin(treatment_filter)]
+    return px.box(
+        data,
+        x="procedimientos_realizados",
+        y="edad",
+        color="genero",
+        hover_data=["id_centro_salud"],
+        title="Comparación de edad de pacientes por tipo de tratamiento y género",
+        color_discrete_sequence=["red", "blue"],
+    )
+
+def visit_duration_histogram(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    # Gráfico de densidad - Distribución de duración de visitas y facturación según el tipo de tratamiento o el centro de salud
+    return budgeted_histogram(
+        data,
+        x="duracion_visita",
+        color="procedimientos_realizados",
+        budget=point_budget,
+        title="Distribución de duración de visitas por tipo de tratamiento",
+        colors=px.colors.qualitative.Pastel,
+    )
+
+def follow_up_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['seguimiento_tratamiento_genero'], x='tipo_tratamiento', y='seguimiento_enfermedad', color='genero', title='Seguimiento de enfermedades por tipo de tratamiento y género')
+
+def medications_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['medicamentos_tratamiento'], x='tipo_tratamiento', y='pacientes', color='medicamentos_recetados', title='Medicamentos recetados por tipo de tratamiento')
+
+def chronic_disease_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    chronic_disease_counts = aggs['enfermedades_cronicas'].sort_values('pacientes', ascending=False)
+    return px.bar(chronic_disease_counts, x='enfermedades_cronicas', y='pacientes', title='Enfermedades crónicas más comunes')
+
+def visit_duration_box(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.box(data, x='tipo_tratamiento', y='duracion_visita', color='genero', title='Duración de visitas por tipo de tratamiento y género')
+
+def visit_duration_violin(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    violin_sample = stratified_sample(data, point_budget, by=['tipo_tratamiento', 'genero'])
+    return px.violin(violin_sample, x='tipo_tratamiento', y='duracion_visita', color='genero', box=True, points="all", title='Distribución de duración de visitas por tipo de tratamiento y género')
+
+def satisfaction_treatment_violin(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    # Gráfico de violín - Distribución de la satisfacción del paciente según el tipo de tratamiento, género y nivel socioeconómico
+    return px.violin(
+        stratified_sample(data, point_budget, by=['tipo_tratamiento', 'genero']),
+        x="tipo_tratamiento",
+        y="satisfaccion_paciente",
+        box=True,
+        points="all",
+        color="genero",
+        title="Distribución de la satisfacción del paciente por tipo de tratamiento y género",
+        color_discrete_sequence=["red", "blue"],
+    )
+
+def satisfaction_socioeconomic_violin(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.violin(
+        stratified_sample(data, point_budget, by=['nivel_socioeconomico', 'genero']),
+        x="nivel_socioeconomico",
+        y="satisfaccion_paciente",
+        box=True,
+        points="all",
+        color="genero",
+        title="Distribución de la satisfacción del paciente por nivel socioeconómico y género",
+        color_discrete_sequence=["red", "blue"],
+    )
+
+def center_rates_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['tasas_por_centro'], x='id_centro_salud', y=['tasas_mortalidad', 'tasas_morbilidad'], barmode='group', title='Tasas de mortalidad y morbilidad por centro de salud')
+
+def center_costs_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['costos_por_centro'], x='id_centro_salud', y=['costo_tratamiento', 'costos_operacion'], title='Promedio de costos de tratamiento y costos de operación por centro de salud')
+
+def adverse_events_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(aggs['eventos_raza_genero'], x='raza', y=['eventos_adversos', 'reclamaciones_responsabilidad_medica'], color='genero', facet_col='genero', title='Eventos adversos y reclamaciones de responsabilidad médica por raza y género')
+
+def treatment_cost_comparison_box(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.box(
+        data,
+        x="id_centro_salud",
+        y="costo_tratamiento",
+        title="Comparación de los costos de tratamiento por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "costo_tratamiento": "Costo del tratamiento"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def operation_cost_comparison_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['costos_por_centro'],
+        x="id_centro_salud",
+        y="costos_operacion",
+        title="Comparación de costos de operación por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "costos_operacion": "Costos de operación"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def cost_analysis_box(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    #Análisis de costos
+    return px.box(
+    stratified_sample(data, point_budget, by='id_centro_salud'),
+    x="id_centro_salud",
+    y="costo_tratamiento",
+    points="all",
+    title="Análisis de costos por centro de salud",
+    color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def time_analysis_line(data, aggs, point_budget=DEFAULT_POINT_BUDGET, grain='dia', window=1):
+    #Análisis de tiempo: duración promedio por periodo, desde las series precalculadas
+    return px.line(
+    rollup(aggs, grain, ['duracion_promedio'], window),
+    x="fecha_visita",
+    y="duracion_promedio",
+    title=f"Tendencias temporales en visitas de seguimiento ({GRAIN_LABELS[grain].lower()})",
+    labels={"duracion_promedio": "Duración promedio de la visita"},
+    color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+
+# Análisis financiero
+
+def billing_histogram(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return budgeted_histogram(
+        data,
+        x="facturacion",
+        color="id_centro_salud",
+        budget=point_budget,
+        title="Distribución de facturación por centro de salud",
+        colors=px.colors.qualitative.Pastel,
+    )
+
+def billing_quantile_box(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    # Misma distribución a partir de cuantiles aproximados, cuando el archivo se procesó por bloques
+    stats = aggs['distribucion_facturacion_centro']
+    fig = go.Figure(go.Box(
+        x=stats['id_centro_salud'],
+        lowerfence=stats['minimo'],
+        q1=stats['q1'],
+        median=stats['mediana'],
+        q3=stats['q3'],
+        upperfence=stats['maximo'],
+        name="facturacion",
+    ))
+    fig.update_layout(title="Distribución de facturación por centro de salud", xaxis_title="id_centro_salud", yaxis_title="facturacion")
+    return fig
+
+def billing_cost_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return budgeted_scatter(data, x='facturacion', y='costo_tratamiento', budget=point_budget, title='Relación entre facturación y costo del tratamiento')
+
+def average_cost_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+    aggs['costos_por_centro'],
+    x="id_centro_salud",
+    y="costo_tratamiento",
+    title="Costo promedio del tratamiento por centro de salud",
+    labels={"id_centro_salud": "Centro de salud", "costo_tratamiento": "Costo promedio"}
+    )
+
+def cost_success_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return budgeted_scatter(
+        data,
+        x="costo_tratamiento",
+        y="tasa_exito_tratamiento",
+        budget=point_budget,
+        by="id_centro_salud",
+        color="id_centro_salud",
+        title="Relación entre costo del tratamiento y tasa de éxito",
+        labels={"costo_tratamiento": "Costo del tratamiento", "tasa_exito_tratamiento": "Tasa de éxito"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def insurance_coverage_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['cobertura_por_centro'],
+        x="id_centro_salud",
+        y="porcentaje_cubierto",
+        title="Porcentaje promedio de facturación cubierta por seguros por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "porcentaje_cubierto": "Porcentaje cubierto"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def operation_cost_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['costos_por_centro'],
+        x="id_centro_salud",
+        y="costos_operacion",
+        title="Comparación de costos de operación por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "costos_operacion": "Costo de operación"}
+    )
+
+def billing_revenue_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['facturacion_procedimiento'],
+        x="procedimientos_realizados",
+        y="facturacion",
+        title="Ingresos por facturación según el tipo de tratamiento",
+        labels={"procedimiento realizado": "Tipo de tratamiento", "facturacion": "Ingresos por facturación"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def insurance_payments_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['facturacion_procedimiento'],
+        x="procedimientos_realizados",
+        y="pago_seguros",
+        title="Pagos de seguros según el tipo de tratamiento",
+        labels={"procedimiento realizado": "Tipo de tratamiento", "pago_seguros": "Pagos de seguros"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+
+# Análisis de calidad
+
+def performance_radar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    #Gráfico de radar - Comparación de indicadores de desempeño por tipo de tratamiento
+    categories = RATE_COLUMNS
+
+    fig = go.Figure()
+
+    for _, treatment in aggs['indicadores_tratamiento'].iterrows():
+        values = [treatment[col] for col in categories]
+        fig.add_trace(go.Scatterpolar(r=values, theta=categories, fill='toself', name=treatment['tipo_tratamiento']))
+
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=True, title="Comparación de indicadores de desempeño por tipo de tratamiento")
+    return fig
+
+def center_comparison_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    #Comparación de centros de salud
+    return px.bar(
+    aggs['calidad_por_centro'],
+    x="id_centro_salud",
+    y="tasa_exito_tratamiento",
+    text="tasa_exito_tratamiento",
+    title="Comparación de centros de salud por tasa de éxito en tratamientos",
+    color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def cost_success_satisfaction_3d(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.scatter_3d(stratified_sample(data, point_budget, by=['id_centro_salud', 'genero']), x='costo_tratamiento', y='tasa_exito_tratamiento', z='satisfaccion_paciente', color='id_centro_salud', symbol='genero', title='Relación entre costos de tratamiento, tasas de éxito y satisfacción del paciente')
+
+def research_trend_line(data, aggs, point_budget=DEFAULT_POINT_BUDGET, grain='dia', window=1):
+    columns = ['ensayos_clinicos', 'publicaciones_cientificas', 'descubrimientos_medicos']
+    return px.line(rollup(aggs, grain, columns, window), x='fecha_visita', y=columns, title='Tendencias en ensayos clínicos, publicaciones científicas y descubrimientos médicos')
+
+def adverse_events_trend_line(data, aggs, point_budget=DEFAULT_POINT_BUDGET, grain='dia', window=1):
+    columns = ['eventos_adversos', 'reclamaciones_responsabilidad_medica']
+    return px.line(rollup(aggs, grain, columns, window), x='fecha_visita', y=columns, title='Tendencias en eventos adversos y reclamaciones de responsabilidad médica')
+
+def satisfaction_safety_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return budgeted_scatter(data, x='satisfaccion_paciente', y='seguridad_paciente', budget=point_budget, title='Relación entre satisfacción del paciente y seguridad del paciente')
+
+def treatment_success_rate_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['indicadores_tratamiento'],
+        x="tipo_tratamiento",
+        y="tasa_exito_tratamiento",
+        title="Tasa de éxito del tratamiento por tipo de tratamiento",
+        labels={"tipo_tratamiento": "Tipo de tratamiento", "tasa_exito_tratamiento": "Tasa de éxito"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def patient_satisfaction_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['calidad_por_centro'],
+        x="id_centro_salud",
+        y="satisfaccion_paciente",
+        title="Índice de satisfacción del paciente por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "satisfaccion_paciente": "Satisfacción del paciente"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def morbidity_rate_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['calidad_por_centro'],
+        x="id_centro_salud",
+        y="tasas_morbilidad",
+        title="Tasas de morbilidad por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "tasas_morbilidad": "Tasa de morbilidad"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+def mortality_rate_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET):
+    return px.bar(
+        aggs['calidad_por_centro'],
+        x="id_centro_salud",
+        y="tasas_mortalidad",
+        title="Tasas de mortalidad por centro de salud",
+        labels={"id_centro_salud": "Centro de salud", "tasas_mortalidad": "Tasa de mortalidad"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+
+# Exploración por dimensión (dash_app.py)
+
+def satisfaction_by_dimension_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET, dimension='genero'):
+    # Una barra por categoría con la satisfacción promedio, en lugar de un segmento por paciente
+    return px.bar(aggs[f'satisfaccion_{dimension}'], x=dimension, y="satisfaccion_paciente", color=dimension, hover_data=['pacientes'])
+
+def age_success_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET, dimension='genero'):
+    # Tasa de éxito promedio por edad y categoría
+    return px.scatter(aggs[f'exito_edad_{dimension}'], x="edad", y="tasa_exito_tratamiento", color=dimension, size='pacientes')
+
+
+# Segmentación de pacientes: aggs[f'segmentos_{k}'] es el resultado de segment_patients con k segmentos
+
+def segment_size_bar(data, aggs, point_budget=DEFAULT_POINT_BUDGET, segments=DEFAULT_SEGMENTS):
+    profile = aggs[f'segmentos_{segments}']['perfil']
+    return px.bar(profile, x='segmento', y='pacientes', color='segmento', hover_data=['genero', 'raza', 'enfermedades_cronicas', 'nivel_socioeconomico'], labels={'segmento': 'Segmento', 'pacientes': 'Pacientes'}, title="Pacientes por segmento")
+
+def segment_profile_heatmap(data, aggs, point_budget=DEFAULT_POINT_BUDGET, segments=DEFAULT_SEGMENTS):
+    # Desviaciones respecto del promedio general: rojo por encima, azul por debajo
+    standardized = aggs[f'segmentos_{segments}']['perfil_estandarizado']
+    limit = max(float(standardized.abs().max().max()), 0.1)
+    return px.imshow(standardized, text_auto='.1f', aspect='auto', color_continuous_scale='RdBu_r', zmin=-limit, zmax=limit, labels={'x': 'Variable', 'y': 'Segmento', 'color': 'Desviaciones'}, title="Perfil de cada segmento frente al promedio")
+
+def segment_dendrogram(data, aggs, point_budget=DEFAULT_POINT_BUDGET, segments=DEFAULT_SEGMENTS):
+    # Jerarquía entre los centroides: qué segmentos se parecen más entre sí
+    result = aggs[f'segmentos_{segments}']
+    tree = dendrogram(result['enlace'], labels=result['perfil']['segmento'].tolist(), no_plot=True)
+    fig = go.Figure([
+        go.Scatter(x=x, y=y, mode='lines', line=dict(color='#636efa'), hoverinfo='skip', showlegend=False)
+        for x, y in zip(tree['icoord'], tree['dcoord'])
+    ])
+    # scipy sitúa la hoja i en la coordenada 10 * i + 5
+    fig.update_xaxes(tickvals=[10 * i + 5 for i in range(len(tree['ivl']))], ticktext=tree['ivl'])
+    fig.update_layout(title="Dendrograma de los centroides", yaxis_title="Distancia (Ward)")
+    return fig
+
+def segment_scatter(data, aggs, point_budget=DEFAULT_POINT_BUDGET, segments=DEFAULT_SEGMENTS):
+    # Muestra estratificada por segmento: cada uno conserva puntos aunque sea pequeño
+    result = aggs[f'segmentos_{segments}']
+    labelled = data[['edad', 'facturacion']].assign(segmento=pd.Categorical.from_codes(result['etiquetas'], result['perfil']['segmento']))
+    return px.scatter(stratified_sample(labelled, point_budget, by='segmento'), x='edad', y='facturacion', color='segmento', labels={'edad': 'Edad', 'facturacion': 'Facturación', 'segmento': 'Segmento'}, title="Edad y facturación por segmento")
+
+
+# Gráficos de cada panel, en el orden en que se muestran
+PANEL_CHARTS = {
+    "Información general": {
+        'ubicacion_genero': location_scatter,
+        'pacientes_raza_genero': race_gender_bar,
+        'pacientes_nse_genero': socioeconomic_gender_bar,
+        'pacientes_nse': socioeconomic_pie,
+        'pacientes_idioma': language_pie,
+        'pacientes_tratamiento': treatment_pie,
+        'densidad_pacientes': density_map,
+        'edad_procedimiento': age_by_procedure_box,
+        'duracion_procedimiento': visit_duration_histogram,
+        'seguimiento_tratamiento': follow_up_bar,
+        'medicamentos_tratamiento': medications_bar,
+        'enfermedades_cronicas': chronic_disease_bar,
+        'duracion_tratamiento_caja': visit_duration_box,
+        'duracion_tratamiento_violin': visit_duration_violin,
+        'satisfaccion_tratamiento': satisfaction_treatment_violin,
+        'satisfaccion_nse': satisfaction_socioeconomic_violin,
+        'tasas_centro': center_rates_bar,
+        'costos_centro': center_costs_bar,
+        'eventos_raza_genero': adverse_events_bar,
+        'costo_tratamiento_centro': treatment_cost_comparison_box,
+        'costos_operacion_centro': operation_cost_comparison_bar,
+        'analisis_costos': cost_analysis_box,
+        'duracion_temporal': time_analysis_line,
+    },
+    "Análisis financiero": {
+        'facturacion_centro': billing_histogram,
+        'facturacion_costo': billing_cost_scatter,
+        'costo_promedio_centro': average_cost_bar,
+        'costo_exito': cost_success_scatter,
+        'cobertura_centro': insurance_coverage_bar,
+        'costo_operacion_centro': operation_cost_bar,
+        'ingresos_procedimiento': billing_revenue_bar,
+        'pagos_seguros_procedimiento': insurance_payments_bar,
+    },
+    "Análisis de calidad": {
+        'indicadores_tratamiento': performance_radar,
+        'exito_centro': center_comparison_bar,
+        'costo_exito_satisfaccion': cost_success_satisfaction_3d,
+        'tendencia_investigacion': research_trend_line,
+        'tendencia_eventos': adverse_events_trend_line,
+        'satisfaccion_seguridad': satisfaction_safety_scatter,
+        'exito_tratamiento': treatment_success_rate_bar,
+        'satisfaccion_centro': patient_satisfaction_bar,
+        'morbilidad_centro': morbidity_rate_bar,
+        'mortalidad_centro': mortality_rate_bar,
+    },
+    "Exploración": {
+        'satisfaccion_dimension': satisfaction_by_dimension_bar,
+        'edad_exito_dimension': age_success_scatter,
+    },
+}
+
+# Sustitutos de los gráficos que necesitan todas las filas, para datasets procesados por bloques
+STREAMING_CHARTS = {
+    'facturacion_centro': 'facturacion_centro_cuantiles',
+}
+
+# Gráficos que dependen del modelo ajustado en la sesión; no entran en el informe ni en la medición
+SEGMENT_CHARTS = {
+    'segmentos_tamano': segment_size_bar,
+    'segmentos_perfil': segment_profile_heatmap,
+    'segmentos_dendrograma': segment_dendrogram,
+    'segmentos_dispersion': segment_scatter,
+}
+
+CHARTS = {chart_id: builder for charts in PANEL_CHARTS.values() for chart_id, builder in charts.items()}
+CHARTS.update(SEGMENT_CHARTS)
+CHARTS['facturacion_centro_cuantiles'] = billing_quantile_box
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from aggregations import CHART_AGGREGATIONS, _derived_columns, compute_aggregates
+
+# Dimensiones que cruzan casi todos los gráficos del panel
+CUBE_DIMENSIONS = [
+    'id_centro_salud', 'genero', 'raza', 'nivel_socioeconomico',
+    'tipo_tratamiento', 'procedimientos_realizados',
+]
+
+CUBE_MEASURES = [
+    'edad', 'duracion_visita', 'facturacion', 'pago_seguros', 'porcentaje_cubierto',
+    'costo_tratamiento', 'costos_operacion', 'tasa_exito_tratamiento', 'satisfaccion_paciente',
+    'tasas_mortalidad', 'tasas_morbilidad', 'seguridad_paciente', 'seguimiento_enfermedad',
+    'eventos_adversos', 'reclamaciones_responsabilidad_medica',
+]
+
+# Por encima de este número de celdas posibles se numeran solo las combinaciones observadas
+DENSE_CELL_LIMIT = 20_000_000
+
+
+def _codes(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def build_cube(data, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES):
+    # Cuboide base: conteo, suma y suma de cuadrados de cada medida por celda, en una sola pasada
+    data = _derived_columns(data)
+    dimensions = [d for d in dimensions if d in data.columns]
+    measures = [m for m in measures if m in data.columns]
+    if not dimensions:
+        return pd.DataFrame()
+
+    codes, levels = zip(*(_codes(data[d]) for d in dimensions))
+    codes = np.vstack(codes)
+    # El valor ausente tiene su propio código (el último de cada dimensión): la fila sigue contando en los
+    # cortes que no agrupan por esa dimensión y rollup_cube la descarta solo en los que sí
+    shape = tuple(len(level) + 1 for level in levels)
+    codes = np.where(codes >= 0, codes, np.array(shape)[:, None] - 1)
+
+    cell = np.ravel_multi_index(codes, shape)
+    if np.prod(shape, dtype=float) > DENSE_CELL_LIMIT:
+        observed, cell = np.unique(cell, return_inverse=True)
+    else:
+        observed = None
+    cells = int(cell.max()) + 1 if len(cell) else 0
+
+    columns = {'pacientes': np.bincount(cell, minlength=cells)}
+    for m in measures:
+        values = data[m].to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        columns[f"{m}__n"] = np.bincount(cell, weights=present, minlength=cells)
+        columns[f"{m}__sum"] = np.bincount(cell, weights=values, minlength=cells)
+        columns[f"{m}__sumsq"] = np.bincount(cell, weights=values * values, minlength=cells)
+
+    used = np.flatnonzero(columns['pacientes'])
+    positions = np.unravel_index(used if observed is None else observed[used], shape)
+    cube = {}
+    for d, p, level in zip(dimensions, positions, levels):
+        p = np.where(p < len(level), p, -1)
+        if isinstance(data[d].dtype, pd.CategoricalDtype):
+            cube[d] = pd.Categorical.from_codes(p, categories=level)
+        elif (p >= 0).all():
+            cube[d] = level[p]
+        else:
+            # Enteros con ausentes pasan a float, como en la columna original
+            values = level.to_numpy()[np.maximum(p, 0)]
+            values = values.astype(float) if pd.api.types.is_numeric_dtype(level) else values.astype(object)
+            cube[d] = np.where(p >= 0, values, np.nan)
+    cube.update({name: values[used] for name, values in columns.items()})
+    return pd.DataFrame(cube)
+
+
+def rollup_cube(cube, dimensions, measures=None):
+    # Cualquier corte del cubo: se suman las celdas y se derivan promedio y desviación estándar.
+    # Como en el groupby de pandas, las celdas con un valor ausente en las claves del corte no cuentan
+    measures = measures or [c[:-len('__sum')] for c in cube.columns if c.endswith('__sum')]
+    columns = ['pacientes'] + [f"{m}__{part}" for m in measures for part in ('n', 'sum', 'sumsq')]
+    rolled = cube.groupby(list(dimensions), observed=True)[columns].sum() if dimensions else cube[columns].sum().to_frame().T
+    table = {'pacientes': rolled['pacientes'].astype(np.int64)}
+    for m in measures:
+        n = rolled[f"{m}__n"].where(rolled[f"{m}__n"] > 0)
+        mean = rolled[f"{m}__sum"] / n
+        table[f"{m}__sum"] = rolled[f"{m}__sum"]
+        table[f"{m}__mean"] = mean
+        # Desviación estándar muestral, como Series.std()
+        table[f"{m}__std"] = np.sqrt(((rolled[f"{m}__sumsq"] - n * mean ** 2) / (n - 1)).clip(lower=0))
+    return pd.DataFrame(table, index=rolled.index).reset_index(drop=not dimensions)
+
+
+def _answerable(keys, measures, cube):
+    return set(keys) <= set(CUBE_DIMENSIONS) & set(cube.columns) and all(
+        func == 'size' or (func in ('sum', 'mean') and f"{column}__sum" in cube.columns)
+        for column, func in measures.values()
+    )
+
+
+def cube_aggregates(data, specs=CHART_AGGREGATIONS, cube=None):
+    # Las especificaciones sobre dimensiones del cubo se resuelven por agregación del cubo;
+    # el resto (fechas, medicamentos, idioma...) sigue en pandas
+    cube = build_cube(data) if cube is None else cube
+    aggregates = {}
+    remaining = {}
+    for name, (keys, measures) in specs.items():
+        if not _answerable(keys, measures, cube):
+            remaining[name] = (keys, measures)
+            continue
+        rolled = rollup_cube(cube, keys, sorted({column for column, func in measures.values() if func != 'size'}))
+        table = rolled[list(keys)].copy()
+        for output, (column, func) in measures.items():
+            table[output] = rolled['pacientes'] if func == 'size' else rolled[f"{column}__{func}"]
+        aggregates[name] = table
+    aggregates.update(compute_aggregates(data, remaining))
+    aggregates['cubo'] = cube
+    return aggregates
@@ -1,14 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import dash
-import dash_core_components as dcc
-import dash_html_components as html
-from dash.dependencies import Input, Output
-import plotly.express as px
-import pandas as pd
+from dash import dcc, html
+from dash.dependencies import Input, Output, State
+
+from aggregations import DIMENSION_AGGREGATIONS, DIMENSIONS
+from figure_cache import cached_figure
+from ingest import AppendingCsv
+from payload import binary_figure
+
+DATA_FILE = os.environ.get("DATOS_DASH", "datos_med.csv")
+
+# Segundos entre comprobaciones de filas nuevas en el CSV y entre refrescos del navegador
+REFRESH_SECONDS = int(os.environ.get("DASH_REFRESCO", "30"))
+
+# Milisegundos entre consultas del navegador mientras una figura pedida aún se está construyendo
+POLL_MS = 200
+
+# Hilos que construyen las figuras fuera de los hilos que atienden las peticiones
+WORKERS = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="figuras")
+
+# Datos de ejemplo; se cargan con la primera petición y después solo se lee la cola añadida
+source = AppendingCsv(DATA_FILE, DIMENSION_AGGREGATIONS)
+_source_lock = threading.Lock()
+
+# Una sola construcción en curso por (dataset, valor), aunque la pidan varios usuarios a la vez
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def load_data(path=DATA_FILE):
+    global source
+    if path != source.path:
+        source = AppendingCsv(path, DIMENSION_AGGREGATIONS)
+    source.refresh()
+    warm_figures(source.snapshot)
+
+
+def current_snapshot():
+    # Con app.server bajo un servidor WSGI el módulo solo se importa: la primera petición carga el CSV
+    # y arranca el sondeo de filas nuevas
+    if source.snapshot[0] is None:
+        with _source_lock:
+            if source.snapshot[0] is None:
+                load_data()
+                source.watch(REFRESH_SECONDS, warm_figures)
+    return source.snapshot
+
+
+def warm_figures(snapshot):
+    # Se precalculan todas las opciones del desplegable en segundo plano y se olvidan las versiones anteriores
+    with _pending_lock:
+        for key in [key for key in _pending if key[0] != snapshot[0]]:
+            del _pending[key]
+    for dimension in DIMENSIONS:
+        submit_figures(snapshot, dimension)
+
+
+def build_figures(snapshot, value):
+    # Ambas salidas en una pasada, desde las tablas ya agregadas por dimensión; dcc.Graph recibe arreglos binarios
+    # Las dos vistas salen solo de los agregados: las filas (snapshot[1]) no se concatenan
+    dataset_key, _, aggs = snapshot
+    return (
+        binary_figure(cached_figure(dataset_key, 'satisfaccion_dimension', None, aggs, dimension=value)),
+        binary_figure(cached_figure(dataset_key, 'edad_exito_dimension', None, aggs, dimension=value)),
+    )
+
+
+def submit_figures(snapshot, value):
+    key = (snapshot[0], value)
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _pending[key] = WORKERS.submit(build_figures, snapshot, value)
+    return future
 
-# Carga datos de ejemplo
-data = pd.read_csv("datos_med.csv")
 
 app = dash.Dash(__name__)
+server = app.server
 
 app.layout = html.Div([
     dcc.Dropdown(
@@ -18,27 +89,37 @@ app.layout = html.Div([
             {"label": "Raza", "value": "raza"},
             {"label": "Nivel Socioeconómico", "value": "nivel_socioeconomico"}
         ],
-        value="genero"
+        value="genero",
+        # Sin opción vacía: cada figura sale de la tabla agregada de una dimensión
+        clearable=False
     ),
     dcc.Graph(id="bar_chart"),
-    dcc.Graph(id="scatter_chart")
+    dcc.Graph(id="scatter_chart"),
+    dcc.Interval(id="refresco", interval=REFRESH_SECONDS * 1000),
+    # Solo corre mientras hay figuras pendientes: las recoge cuando el hilo de trabajo termina
+    dcc.Interval(id="espera", interval=POLL_MS, disabled=True),
+    dcc.Store(id="version")
 ])
 
 @app.callback(
-    Output("bar_chart", "figure"),
-    [Input("dropdown", "value")]
-)
-def update_bar_chart(value):
-    fig = px.bar(data, x=value, y="satisfaccion_paciente", color=value)
-    return fig
-
-@app.callback(
-    Output("scatter_chart", "figure"),
-    [Input("dropdown", "value")]
+    [Output("bar_chart", "figure"), Output("scatter_chart", "figure"), Output("version", "data"), Output("espera", "disabled")],
+    [Input("dropdown", "value"), Input("refresco", "n_intervals"), Input("espera", "n_intervals")],
+    [State("version", "data")]
 )
-def update_scatter_chart(value):
-    fig = px.scatter(data, x="edad", y="tasa_exito_tratamiento", color=value)
-    return fig
+def update_charts(value, n_intervals=None, polls=None, version=None):
+    if not value:
+        return dash.no_update, dash.no_update, dash.no_update, True
+    snapshot = current_snapshot()
+    # El intervalo solo vuelve a enviar las figuras si el archivo recibió filas nuevas
+    if dash.ctx.triggered_id == "refresco" and version == snapshot[0][0]:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    future = submit_figures(snapshot, value)
+    # Sin esperar al hilo de trabajo: se dejan las figuras actuales y el navegador vuelve a consultar
+    if not future.done():
+        return dash.no_update, dash.no_update, dash.no_update, False
+    bar_chart, scatter_chart = future.result()
+    return bar_chart, scatter_chart, snapshot[0][0], True
 
 if __name__ == "__main__":
-    app.run_server(debug=True, port=8051)
+    current_snapshot()
+    app.run(debug=True, port=8051, threaded=True)
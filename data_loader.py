@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+# Esquema declarado de las exportaciones generadas por datosgen.py
+CATEGORICAL_COLUMNS = [
+    'genero', 'raza', 'ubicacion_geografica', 'nivel_socioeconomico', 'idioma',
+    'enfermedades_cronicas', 'diagnosticos_previos', 'resultados_examenes',
+    'tratamientos_ant', 'tipo_tratamiento', 'medicamentos_recetados',
+    'procedimientos_realizados',
+]
+
+INTEGER_COLUMNS = [
+    'id_paciente', 'edad', 'duracion_visita', 'resultados_pruebas_lab', 'facturacion',
+    'pago_seguros', 'costo_tratamiento', 'id_centro_salud', 'camas_hospital',
+    'medico_disponibles', 'enfermeras_disponibles', 'equipos_medicos', 'suministros',
+    'costos_operacion', 'recursos_humanos', 'visitas_seguimiento', 'seguimiento_enfermedad',
+    'eventos_adversos', 'reclamaciones_responsabilidad_medica',
+    'incidentes_seguridad_paciente', 'ensayos_clinicos', 'publicaciones_cientificas',
+    'descubrimientos_medicos',
+]
+
+FLOAT_COLUMNS = [
+    'latitud', 'longitud', 'tasa_exito_tratamiento', 'satisfaccion_paciente',
+    'tasas_mortalidad', 'tasas_morbilidad', 'seguridad_paciente',
+    'indicadores_desempenio', 'cumplimiento_recomendaciones',
+]
+
+DATE_COLUMNS = ['fecha_visita']
+
+# Extensiones aceptadas y el lector columnar que les corresponde
+DATASET_FORMATS = {
+    '.csv': 'csv',
+    '.txt': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+
+def dataset_fingerprint(raw):
+    # Huella del contenido subido, usada como clave de las cachés por dataset
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _as_buffer(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def apply_schema(data):
+    # Convierte a categóricas y reduce enteros/flotantes al tipo más pequeño que los contiene
+    for column in CATEGORICAL_COLUMNS:
+        if column in data.columns and not isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].astype('category')
+    for column in INTEGER_COLUMNS:
+        if column in data.columns and pd.api.types.is_integer_dtype(data[column]):
+            data[column] = pd.to_numeric(data[column], downcast='integer')
+    for column in FLOAT_COLUMNS:
+        if column in data.columns and pd.api.types.is_float_dtype(data[column]):
+            data[column] = pd.to_numeric(data[column], downcast='float')
+    for column in DATE_COLUMNS:
+        if column in data.columns and not pd.api.types.is_datetime64_any_dtype(data[column]):
+            data[column] = pd.to_datetime(data[column])
+    return data
+
+
+def read_csv_typed(source, usecols=None):
+    columns = pd.read_csv(_as_buffer(source), nrows=0).columns
+    if usecols is not None:
+        columns = [column for column in columns if column in usecols]
+
+    # Las categóricas y la fecha se resuelven durante el parseo, en una sola pasada
+    data = pd.read_csv(
+        _as_buffer(source),
+        usecols=list(columns),
+        dtype={column: 'category' for column in CATEGORICAL_COLUMNS if column in columns},
+        parse_dates=[column for column in DATE_COLUMNS if column in columns],
+    )
+    return apply_schema(data)
+
+
+def read_csv_rows(source, columns):
+    # Filas de CSV sin cabecera (por ejemplo, la cola añadida a un archivo) con el esquema declarado
+    data = pd.read_csv(
+        _as_buffer(source),
+        header=None,
+        names=list(columns),
+        dtype={column: 'category' for column in CATEGORICAL_COLUMNS if column in columns},
+        parse_dates=[column for column in DATE_COLUMNS if column in columns],
+    )
+    return apply_schema(data)
+
+
+def concat_frames(frames):
+    # Concatena conservando las categóricas: se unen las categorías en lugar de pasar a object
+    frames = [frames[0]] + [frame[list(frames[0].columns)] for frame in frames[1:]]
+    columns = {}
+    for column in frames[0].columns:
+        parts = [frame[column] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            # Una columna vacía no tiene categorías del mismo tipo que las demás
+            empty = max(parts, key=lambda part: len(part.cat.categories)).cat.categories[:0]
+            parts = [part if len(part.cat.categories) else part.cat.set_categories(empty) for part in parts]
+            columns[column] = union_categoricals(parts, ignore_order=True)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_parquet_typed(source, usecols=None):
+    columns = pq.ParquetFile(_as_buffer(source)).schema_arrow.names
+    if usecols is not None:
+        columns = [column for column in columns if column in usecols]
+    # Solo se decodifican los grupos de columnas pedidos
+    data = pq.read_table(_as_buffer(source), columns=list(columns)).to_pandas()
+    return apply_schema(data)
+
+
+def read_arrow_typed(source, usecols=None):
+    # El esquema se lee del pie del archivo IPC sin decodificar columnas
+    columns = pa.ipc.open_file(_as_buffer(source)).schema.names
+    if usecols is not None:
+        columns = [column for column in columns if column in usecols]
+    data = feather.read_table(_as_buffer(source), columns=list(columns)).to_pandas()
+    return apply_schema(data)
+
+
+def dataset_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in DATASET_FORMATS:
+        raise ValueError(f"Formato de archivo no soportado: {extension}")
+    return DATASET_FORMATS[extension]
+
+
+def read_dataset(source, fmt, usecols=None):
+    if fmt == 'parquet':
+        return read_parquet_typed(source, usecols)
+    if fmt == 'arrow':
+        return read_arrow_typed(source, usecols)
+    return read_csv_typed(source, usecols)
+
+
+def convert_csv_to_parquet(csv_path, parquet_path, chunksize=500_000):
+    # Conversión por bloques: la memoria queda acotada por el tamaño del bloque
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    chunks = pd.read_csv(
+        csv_path,
+        chunksize=chunksize,
+        dtype={column: 'category' for column in CATEGORICAL_COLUMNS if column in columns},
+        parse_dates=[column for column in DATE_COLUMNS if column in columns],
+    )
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                # Índices de diccionario fijos en int32 para que todos los bloques compartan esquema
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                for i, field in enumerate(schema):
+                    if pa.types.is_dictionary(field.type):
+                        schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+                writer = pq.ParquetWriter(parquet_path, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte una exportación CSV a Parquet")
+    parser.add_argument("csv", help="Archivo CSV de entrada")
+    parser.add_argument("parquet", nargs="?", help="Archivo Parquet de salida")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+
+    output = args.parquet or os.path.splitext(args.csv)[0] + ".parquet"
+    rows = convert_csv_to_parquet(args.csv, output, args.chunksize)
+    print(f"{rows} filas escritas en {output}")
@@ -1,38 +1,20 @@
-import csv
-import random
-from faker import Faker
-
-fake = Faker('es_ES')
-
-def random_medication():
-    return random.choice(['Enalapril', 'Prednisona', 'Salbutamol', 'Ibuprofeno', 'Metformina', 'Atorvastatina', 'Paracetamol', 'Amoxicilina', 'Omlodipino', 'Losartán', 'Aspirina', 'Omeprazol', 'Clopidogrel', 'Captopril', 'Furosemida'])
-
-def random_procedure():
-    return random.choice(['Laboratorio', 'Radiografía', 'Ecografía', 'Endoscopia', 'Tomografía', 'Resonancia magnética', 'Biopsia', 'Espirometría', 'Electrocardiograma', 'Densitometría ósea'])
-
-def random_exam():
-    return random.choice(['140/90', '3.4', '125/80', '110/70', '5.6', '120/80', '4.5', '130/85', '2.8', '7.9'])
-
-def random_diagnosis():
-    return random.choice(['Diabetes', 'Hipertensión', 'Artritis', 'Asma', 'Obesidad', 'Depresión', 'Ansiedad', 'Osteoporosis', 'Insuficiencia renal', 'Enfermedad cardíaca', 'Alzheimer', 'Cáncer', 'Esclerosis múltiple'])
-
-def random_nse():
-    nse_probs = [1, 9, 28.5, 26.2, 35.3]
-    nse_values = ['A', 'B', 'C', 'D', 'E']
-    return random.choices(nse_values, weights=nse_probs, k=1)[0]
-
-def random_language():
-    lang_probs = [83.11, 10.92, 1.67]
-    lang_values = ['español', 'quechua', 'aimara']
-    return random.choices(lang_values, weights=lang_probs, k=1)[0]
-
-def random_race():
-    race_probs = [60.2, 25.8, 5.9, 3.6, 1.2, 3.3]
-    race_values = ['Mestizo', 'Amerindio', 'Blanco', 'Negro', 'Asiático', 'Otros']
-    return random.choices(race_values, weights=race_probs, k=1)[0]
-
-def random_location():
-    locations_lima = [
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MEDICATIONS = ['Enalapril', 'Prednisona', 'Salbutamol', 'Ibuprofeno', 'Metformina', 'Atorvastatina', 'Paracetamol', 'Amoxicilina', 'Omlodipino', 'Losartán', 'Aspirina', 'Omeprazol', 'Clopidogrel', 'Captopril', 'Furosemida']
+PROCEDURES = ['Laboratorio', 'Radiografía', 'Ecografía', 'Endoscopia', 'Tomografía', 'Resonancia magnética', 'Biopsia', 'Espirometría', 'Electrocardiograma', 'Densitometría ósea']
+EXAMS = ['140/90', '3.4', '125/80', '110/70', '5.6', '120/80', '4.5', '130/85', '2.8', '7.9']
+DIAGNOSES = ['Diabetes', 'Hipertensión', 'Artritis', 'Asma', 'Obesidad', 'Depresión', 'Ansiedad', 'Osteoporosis', 'Insuficiencia renal', 'Enfermedad cardíaca', 'Alzheimer', 'Cáncer', 'Esclerosis múltiple']
+
+locations_lima = [
     {'city': 'Lima', 'latitude': -12.0464, 'longitude': -77.0428},
     {'city': 'San Isidro', 'latitude': -12.0989, 'longitude': -77.0365},
     {'city': 'Miraflores', 'latitude': -12.1111, 'longitude': -77.0301},
@@ -43,7 +25,7 @@ def random_location():
     {'city': 'San Borja', 'latitude': -12.0892, 'longitude': -76.9976},
     ]
 
-    locations_provinces = [
+locations_provinces = [
         {'city': 'Arequipa', 'latitude': -16.4090, 'longitude': -71.5375},
         {'city': 'Trujillo', 'latitude': -8.1092, 'longitude': -79.0215},
         {'city': 'Cusco', 'latitude': -13.5319, 'longitude': -71.9673},
@@ -54,18 +36,7 @@ def random_location():
         {'city': 'Tacna', 'latitude': -18.0056, 'longitude': -70.2463},
     ] # Agrega más ciudades fuera de Lima aquí
 
-    if random.random() < 0.7:  # 70% de probabilidad de elegir una ubicación en Lima
-        location = random.choice(locations_lima)
-    else:  # 30% de probabilidad de elegir una ubicación fuera de Lima
-        location = random.choice(locations_provinces)
-
-    return location['city'], location['latitude'], location['longitude']
-
-num_records = 10000
-output_file = 'datos_med.csv'
-
-with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-    fieldnames = ['id_paciente', 'edad', 'genero', 'raza', 'ubicacion_geografica','latitud','longitud',
+fieldnames = ['id_paciente', 'edad', 'genero', 'raza', 'ubicacion_geografica','latitud','longitud',
               'nivel_socioeconomico', 'idioma', 'enfermedades_cronicas',
               'diagnosticos_previos', 'resultados_examenes', 'tratamientos_ant',
               'fecha_visita', 'duracion_visita', 'tipo_tratamiento',
@@ -81,54 +52,188 @@ with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
               'reclamaciones_responsabilidad_medica', 'incidentes_seguridad_paciente',
               'ensayos_clinicos', 'publicaciones_cientificas', 'descubrimientos_medicos']
 
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for i in range(num_records):
-        city, latitude, longitude = random_location()
-        writer.writerow({'id_paciente': i + 1,
-                         'edad': random.randint(18, 100),
-                         'genero': fake.random_element(elements=('M', 'F')),
-                         'raza': random_race(),
-                         'ubicacion_geografica': city,
-                         'latitud': latitude,
-                         'longitud': longitude,
-                         'nivel_socioeconomico': random_nse(),
-                         'idioma': random_language(),
-                         'enfermedades_cronicas': random_diagnosis(),
-                         'diagnosticos_previos': random_diagnosis(),
-                         'resultados_examenes': random_exam(),
-                         'tratamientos_ant': random_medication(),
-                         'fecha_visita': fake.date_between(start_date='-1y', end_date='today'),
-                         'duracion_visita': random.randint(15, 60),
-                         'tipo_tratamiento': 'Medicación',
-                         'medicamentos_recetados': random_medication(),
-                         'procedimientos_realizados': random_procedure(),
-                         'resultados_pruebas_lab': random.randint(100, 200),
-                         'facturacion': random.randint(800, 3000),
-                         'pago_seguros': random.randint(500, 2500),
-                         'costo_tratamiento': random.randint(300, 2000),
-                         'id_centro_salud': random.randint(1, 10),
-                         'camas_hospital': random.randint(50, 200),
-                         'medico_disponibles': random.randint(3, 15),
-                         'enfermeras_disponibles': random.randint(3, 20),
-                         'equipos_medicos': random.randint(2, 10),
-                         'suministros': random.randint(50, 200),
-                         'tasa_exito_tratamiento': random.uniform(70, 100),
-                         'satisfaccion_paciente': random.uniform(70, 100),
-                         'tasas_mortalidad': random.uniform(0.01, 0.1),
-                         'tasas_morbilidad': random.uniform(0.01, 0.1),
-                         'seguridad_paciente': random.uniform(80, 100),
-                         'indicadores_desempenio': random.uniform(70, 100),
-                         'costos_operacion': random.randint(20000, 60000),
-                         'recursos_humanos': random.randint(50, 150),
-                         'visitas_seguimiento': random.randint(0, 5),
-                         'cumplimiento_recomendaciones': random.uniform(70, 100),
-                         'seguimiento_enfermedad': random.randint(0, 5),
-                         'eventos_adversos': random.randint(0, 2),
-                         'reclamaciones_responsabilidad_medica': random.randint(0, 2),
-                         'incidentes_seguridad_paciente': random.randint(0, 2),
-                         'ensayos_clinicos': random.randint(0, 5),
-                         'publicaciones_cientificas': random.randint(0, 3),
-                         'descubrimientos_medicos': random.randint(0, 2)})
+# Enteros uniformes con extremos incluidos, como random.randint
+INTEGER_RANGES = {
+    'edad': (18, 100),
+    'duracion_visita': (15, 60),
+    'resultados_pruebas_lab': (100, 200),
+    'facturacion': (800, 3000),
+    'pago_seguros': (500, 2500),
+    'costo_tratamiento': (300, 2000),
+    'id_centro_salud': (1, 10),
+    'camas_hospital': (50, 200),
+    'medico_disponibles': (3, 15),
+    'enfermeras_disponibles': (3, 20),
+    'equipos_medicos': (2, 10),
+    'suministros': (50, 200),
+    'costos_operacion': (20000, 60000),
+    'recursos_humanos': (50, 150),
+    'visitas_seguimiento': (0, 5),
+    'seguimiento_enfermedad': (0, 5),
+    'eventos_adversos': (0, 2),
+    'reclamaciones_responsabilidad_medica': (0, 2),
+    'incidentes_seguridad_paciente': (0, 2),
+    'ensayos_clinicos': (0, 5),
+    'publicaciones_cientificas': (0, 3),
+    'descubrimientos_medicos': (0, 2),
+}
+
+# Flotantes uniformes, como random.uniform
+FLOAT_RANGES = {
+    'tasa_exito_tratamiento': (70, 100),
+    'satisfaccion_paciente': (70, 100),
+    'tasas_mortalidad': (0.01, 0.1),
+    'tasas_morbilidad': (0.01, 0.1),
+    'seguridad_paciente': (80, 100),
+    'indicadores_desempenio': (70, 100),
+    'cumplimiento_recomendaciones': (70, 100),
+}
+
+
+def _choice(rng, values, size, weights=None):
+    # Se generan códigos y se construye la categórica sin crear un objeto por fila
+    p = None if weights is None else np.asarray(weights, dtype=float) / sum(weights)
+    codes = rng.choice(len(values), size=size, p=p)
+    return pd.Categorical.from_codes(codes, categories=values)
+
+
+def random_medication(rng, size):
+    return _choice(rng, MEDICATIONS, size)
+
+def random_procedure(rng, size):
+    return _choice(rng, PROCEDURES, size)
+
+def random_exam(rng, size):
+    return _choice(rng, EXAMS, size)
+
+def random_diagnosis(rng, size):
+    return _choice(rng, DIAGNOSES, size)
+
+def random_nse(rng, size):
+    nse_probs = [1, 9, 28.5, 26.2, 35.3]
+    nse_values = ['A', 'B', 'C', 'D', 'E']
+    return _choice(rng, nse_values, size, nse_probs)
+
+def random_language(rng, size):
+    lang_probs = [83.11, 10.92, 1.67]
+    lang_values = ['español', 'quechua', 'aimara']
+    return _choice(rng, lang_values, size, lang_probs)
 
+def random_race(rng, size):
+    race_probs = [60.2, 25.8, 5.9, 3.6, 1.2, 3.3]
+    race_values = ['Mestizo', 'Amerindio', 'Blanco', 'Negro', 'Asiático', 'Otros']
+    return _choice(rng, race_values, size, race_probs)
+
+def random_location(rng, size):
+    locations = locations_lima + locations_provinces
+    # 70% de probabilidad de elegir una ubicación en Lima, 30% fuera de Lima
+    in_lima = rng.random(size) < 0.7
+    codes = np.where(
+        in_lima,
+        rng.integers(0, len(locations_lima), size),
+        len(locations_lima) + rng.integers(0, len(locations_provinces), size),
+    )
+    cities = pd.Categorical.from_codes(codes, categories=[location['city'] for location in locations])
+    latitudes = np.array([location['latitude'] for location in locations])[codes]
+    longitudes = np.array([location['longitude'] for location in locations])[codes]
+    return cities, latitudes, longitudes
+
+
+def generate_chunk(start_id, rows, seed, reference_date):
+    rng = np.random.default_rng(seed)
+    city, latitude, longitude = random_location(rng, rows)
+
+    # Fechas del año anterior a reference_date, como fake.date_between(start_date='-1y', end_date='today')
+    visit_dates = np.datetime64(reference_date, 'D') - rng.integers(0, 366, rows).astype('timedelta64[D]')
+
+    chunk = {
+        'id_paciente': np.arange(start_id + 1, start_id + rows + 1),
+        'genero': _choice(rng, ['M', 'F'], rows),
+        'raza': random_race(rng, rows),
+        'ubicacion_geografica': city,
+        'latitud': latitude,
+        'longitud': longitude,
+        'nivel_socioeconomico': random_nse(rng, rows),
+        'idioma': random_language(rng, rows),
+        'enfermedades_cronicas': random_diagnosis(rng, rows),
+        'diagnosticos_previos': random_diagnosis(rng, rows),
+        'resultados_examenes': random_exam(rng, rows),
+        'tratamientos_ant': random_medication(rng, rows),
+        'fecha_visita': visit_dates,
+        'tipo_tratamiento': pd.Categorical.from_codes(np.zeros(rows, dtype=np.int8), categories=['Medicación']),
+        'medicamentos_recetados': random_medication(rng, rows),
+        'procedimientos_realizados': random_procedure(rng, rows),
+    }
+    for column, (low, high) in INTEGER_RANGES.items():
+        chunk[column] = rng.integers(low, high + 1, rows)
+    for column, (low, high) in FLOAT_RANGES.items():
+        chunk[column] = rng.uniform(low, high, rows)
+    return pd.DataFrame(chunk, columns=fieldnames)
+
+
+def _chunk_plan(rows, chunk_size, seed, reference_date=None):
+    # Una semilla independiente por bloque: el resultado no depende del número de procesos.
+    # La fecha de referencia se fija una vez para todos los bloques (hoy si no se indica)
+    reference_date = str(np.datetime64(reference_date or 'today', 'D'))
+    starts = list(range(0, rows, chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(start, min(chunk_size, rows - start), chunk_seed, reference_date) for start, chunk_seed in zip(starts, seeds)]
+
+
+def _generate(args):
+    return generate_chunk(*args)
+
+
+def iter_chunks(rows, seed=None, chunk_size=500_000, workers=None, reference_date=None):
+    plan = _chunk_plan(rows, chunk_size, seed, reference_date)
+    if workers == 1 or len(plan) == 1:
+        yield from map(_generate, plan)
+        return
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Ventana acotada de bloques en curso: uno nuevo por cada bloque entregado, en orden.
+        # Así la memoria no crece con el número de filas aunque la escritura sea más lenta que la generación
+        pending = deque()
+        tasks = iter(plan)
+        for task in islice(tasks, 2 * workers):
+            pending.append(executor.submit(_generate, task))
+        while pending:
+            chunk = pending.popleft().result()
+            for task in islice(tasks, 1):
+                pending.append(executor.submit(_generate, task))
+            yield chunk
+
+
+def generate_dataset(rows, seed=None, chunk_size=500_000, workers=None, reference_date=None):
+    return pd.concat(iter_chunks(rows, seed, chunk_size, workers, reference_date), ignore_index=True)
+
+
+def write_dataset(output_file, rows, seed=None, fmt='csv', chunk_size=500_000, workers=None, reference_date=None):
+    writer = None
+    try:
+        for i, chunk in enumerate(iter_chunks(rows, seed, chunk_size, workers, reference_date)):
+            if fmt == 'parquet':
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema, compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(output_file, mode='w' if i == 0 else 'a', header=i == 0, index=False, encoding='utf-8')
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos de pacientes")
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--salida", default='datos_med.csv')
+    parser.add_argument("--formato", choices=['csv', 'parquet'], default=None)
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--bloque", type=int, default=500_000, help="Filas por bloque")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser.add_argument("--fecha", default=None, help="Última fecha de visita (AAAA-MM-DD); por defecto, hoy")
+    args = parser.parse_args()
+
+    fmt = args.formato or ('parquet' if args.salida.endswith('.parquet') else 'csv')
+    write_dataset(args.salida, args.filas, args.semilla, fmt, args.bloque, args.procesos, args.fecha)
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+from charts import CHARTS
+from payload import compact_figure
+from sampling import DEFAULT_POINT_BUDGET
+
+# Figuras guardadas como máximo; al superarlo se descarta la menos usada
+FIGURE_CACHE_SIZE = 256
+
+
+def _freeze(value):
+    # Los filtros llegan como listas o conjuntos desde los widgets; la clave debe ser hashable
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def figure_key(dataset_key, chart_id, point_budget=DEFAULT_POINT_BUDGET, **filters):
+    return (dataset_key, chart_id, point_budget, _freeze(filters))
+
+
+class FigureCache:
+    # LRU en memoria compartido por los usuarios y sesiones de un mismo proceso. Streamlit y Dash corren en
+    # procesos distintos y cada uno tiene su propio FIGURES: no se reutilizan figuras entre servidores
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def __contains__(self, key):
+        # Consulta sin contar acierto ni mover la entrada
+        with self._lock:
+            return key in self._figures
+
+    def get(self, key):
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, figure):
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.hits = self.misses = 0
+
+
+FIGURES = FigureCache()
+
+
+def cached_figure(dataset_key, chart_id, data, aggs, point_budget=DEFAULT_POINT_BUDGET, **filters):
+    # dataset_key identifica el contenido (huella del archivo y columnas cargadas), no el objeto en memoria
+    key = figure_key(dataset_key, chart_id, point_budget, **filters)
+    figure = FIGURES.get(key)
+    if figure is None:
+        # Dos usuarios pueden construir la misma figura a la vez; ambos resultados son idénticos.
+        # Se guarda ya compactada: la reducción se paga una vez por figura, no en cada envío
+        figure = compact_figure(CHARTS[chart_id](data, aggs, point_budget, **filters))
+        FIGURES.put(key, figure)
+    return figure
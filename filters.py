@@ -0,0 +1,92 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Filtros globales de la barra lateral; se aplican a todos los gráficos del panel
+FILTER_COLUMNS = ['fecha_visita', 'id_centro_salud', 'ubicacion_geografica', 'genero', 'nivel_socioeconomico']
+
+FILTER_LABELS = {
+    'fecha_visita': "Fecha de visita",
+    'id_centro_salud': "Centro de salud",
+    'ubicacion_geografica': "Ubicación",
+    'genero': "Género",
+    'nivel_socioeconomico': "Nivel socioeconómico",
+}
+
+
+def _value_bitmaps(codes, count):
+    # Un mapa de bits empaquetado (1 bit por fila) para cada valor distinto
+    return np.vstack([np.packbits(codes == code) for code in range(count)]) if count else None
+
+
+def build_filter_index(data, columns=FILTER_COLUMNS):
+    # Construido una vez por dataset; cada consulta se resuelve con OR/AND sobre bytes empaquetados
+    index = {'rows': len(data), 'values': {}, 'bitmaps': {}, 'dates': None}
+    for column in columns:
+        if column not in data.columns:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(data[column]):
+            # Fechas: un mapa por mes y, para los meses del borde del rango, se comprueba el día exacto
+            days = data[column].to_numpy().astype('datetime64[D]')
+            months = days.astype('datetime64[M]')
+            bins, codes = np.unique(months, return_inverse=True)
+            index['dates'] = {'column': column, 'days': days, 'bins': bins, 'bitmaps': _value_bitmaps(codes, len(bins))}
+            continue
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            codes, values = data[column].cat.codes.to_numpy(), list(data[column].cat.categories)
+        else:
+            codes, values = pd.factorize(data[column], sort=True)
+            values = values.tolist()
+        index['values'][column] = values
+        index['bitmaps'][column] = _value_bitmaps(codes, len(values))
+    return index
+
+
+def _date_bitmap(index, start, end):
+    dates = index['dates']
+    start, end = np.datetime64(pd.Timestamp(start).date(), 'D'), np.datetime64(pd.Timestamp(end).date(), 'D')
+    first = np.searchsorted(dates['bins'], start.astype('datetime64[M]'), side='left')
+    last = np.searchsorted(dates['bins'], end.astype('datetime64[M]'), side='right')
+    bits = np.zeros(dates['bitmaps'].shape[1], dtype=np.uint8)
+    for position in range(first, last):
+        month = dates['bins'][position]
+        month_end = (month + 1).astype('datetime64[D]') - 1
+        if start <= month.astype('datetime64[D]') and month_end <= end:
+            bits |= dates['bitmaps'][position]
+        else:
+            # Mes cubierto en parte: solo se revisan las filas de ese mes
+            rows = np.flatnonzero(np.unpackbits(dates['bitmaps'][position], count=index['rows']))
+            day = dates['days'][rows]
+            edge = np.zeros(index['rows'], dtype=bool)
+            edge[rows[(day >= start) & (day <= end)]] = True
+            bits |= np.packbits(edge)
+    return bits
+
+
+def filter_bitmap(index, selection):
+    # selection: {columna: [valores]} y la fecha como (inicio, fin); OR dentro de una columna, AND entre columnas
+    bits = None
+    for column, values in selection.items():
+        if index['dates'] is not None and column == index['dates']['column']:
+            column_bits = _date_bitmap(index, *values)
+        elif column in index['bitmaps']:
+            positions = {value: i for i, value in enumerate(index['values'][column])}
+            codes = [positions[value] for value in values if value in positions]
+            column_bits = np.bitwise_or.reduce(index['bitmaps'][column][codes], axis=0) if codes else \
+                np.zeros(index['bitmaps'][column].shape[1], dtype=np.uint8)
+        else:
+            continue
+        bits = column_bits if bits is None else bits & column_bits
+    return bits
+
+
+def filter_mask(index, selection):
+    # Máscara booleana de filas, o None si no hay ningún filtro activo
+    bits = filter_bitmap(index, selection)
+    return None if bits is None else np.unpackbits(bits, count=index['rows']).astype(bool)
+
+
+def selection_key(selection):
+    # Huella corta de los filtros activos, para distinguir las cachés del subconjunto filtrado
+    return hashlib.blake2b(repr(sorted(selection.items())).encode(), digest_size=8).hexdigest()
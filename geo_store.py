@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import requests
+
+# Directorio local con los límites de Perú descargados previamente
+GEOJSON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geojson')
+
+GEOJSON_FILES = {
+    'provincias': 'peru_provincias.geojson',
+    'distritos': 'peru_distritos.geojson',
+}
+
+# Propiedades donde las distintas fuentes guardan el nombre del territorio
+NAME_PROPERTIES = ['name', 'NOMBDIST', 'NOMBPROV', 'DISTRITO', 'PROVINCIA', 'NOMBRE']
+
+# Tolerancias de simplificación en grados
+TOLERANCES = {
+    'alta': 0.0005,
+    'media': 0.003,
+    'baja': 0.01,
+}
+
+
+def normalize_name(name):
+    # Sin tildes ni mayúsculas, para que "Huancayo" y "HUANCAYO" coincidan
+    name = unicodedata.normalize('NFKD', str(name))
+    return ''.join(c for c in name if not unicodedata.combining(c)).strip().lower()
+
+
+def geojson_path(level):
+    return os.path.join(GEOJSON_DIR, GEOJSON_FILES[level])
+
+
+def available_levels():
+    return [level for level in GEOJSON_FILES if os.path.exists(geojson_path(level))]
+
+
+@lru_cache(maxsize=None)
+def load_collection(level):
+    with open(geojson_path(level), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def name_index(level):
+    index = {}
+    for i, feature in enumerate(load_collection(level)['features']):
+        properties = feature.get('properties') or {}
+        for key in NAME_PROPERTIES:
+            if key in properties:
+                index.setdefault(normalize_name(properties[key]), i)
+                break
+    return index
+
+
+def _simplify_ring(points, tolerance):
+    # Douglas-Peucker iterativo sobre un anillo cerrado
+    if len(points) <= 4:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        segment = points[end] - points[start]
+        relative = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(relative[:, 0], relative[:, 1])
+        else:
+            distances = np.abs(segment[0] * relative[:, 1] - segment[1] * relative[:, 0]) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack.append((start, start + 1 + i))
+            stack.append((start + 1 + i, end))
+    simplified = points[keep]
+    return simplified if len(simplified) >= 4 else points
+
+
+def _simplify_polygon(rings, tolerance):
+    return [np.round(_simplify_ring(np.asarray(ring, dtype=float)[:, :2], tolerance), 5).tolist() for ring in rings]
+
+
+def simplify_geometry(geometry, tolerance):
+    if geometry['type'] == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': _simplify_polygon(geometry['coordinates'], tolerance)}
+    if geometry['type'] == 'MultiPolygon':
+        return {
+            'type': 'MultiPolygon',
+            'coordinates': [_simplify_polygon(polygon, tolerance) for polygon in geometry['coordinates']],
+        }
+    return geometry
+
+
+@lru_cache(maxsize=None)
+def simplified_features(level, tolerance):
+    return [
+        {**feature, 'geometry': simplify_geometry(feature['geometry'], TOLERANCES[tolerance])}
+        for feature in load_collection(level)['features']
+    ]
+
+
+def features_for(names, tolerance='media', levels=('distritos', 'provincias')):
+    # Colección con un polígono por nombre de ubicacion_geografica; el id es el nombre original
+    features = []
+    for name in names:
+        key = normalize_name(name)
+        for level in levels:
+            if level in available_levels() and key in name_index(level):
+                feature = simplified_features(level, tolerance)[name_index(level)[key]]
+                features.append({**feature, 'id': name})
+                break
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def download(level, url, timeout=60):
+    # Se ejecuta una vez desde un equipo con acceso a internet; el panel solo lee del disco
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    collection = response.json()
+    os.makedirs(GEOJSON_DIR, exist_ok=True)
+    with open(geojson_path(level), 'w', encoding='utf-8') as f:
+        json.dump(collection, f)
+    return len(collection['features'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga límites de Perú al almacén GeoJSON local")
+    parser.add_argument("nivel", choices=list(GEOJSON_FILES))
+    parser.add_argument("url", help="URL del GeoJSON de provincias o distritos")
+    args = parser.parse_args()
+
+    count = download(args.nivel, args.url)
+    print(f"{count} polígonos guardados en {geojson_path(args.nivel)}")
@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregations import CHART_AGGREGATIONS, finalize_partials, merge_partials, partial_aggregates
+from data_loader import (apply_schema, concat_frames, dataset_format, read_csv_rows, read_csv_typed,
+                         read_dataset)
+from datosgen import fieldnames, locations_lima, locations_provinces
+
+# Esquema canónico: el de datos_med.csv. Otras exportaciones se traducen con estas tablas declarativas
+COLUMN_ALIASES = {
+    'lat': 'latitud',
+    'lon': 'longitud',
+    'nse': 'nivel_socioeconomico',
+    'centro': 'id_centro_salud',
+}
+
+VALUE_MAPPINGS = {
+    # Extracción con niveles de tres tramos (datos.txt): se llevan a los extremos y al centro de la escala A-E
+    'nivel_socioeconomico': {'Alto': 'A', 'Medio': 'C', 'Bajo': 'E'},
+    'raza': {'Caucásico': 'Blanco', 'Indígena': 'Amerindio'},
+}
+
+# Coordenadas de las ciudades conocidas; las ubicaciones fuera de estas tablas quedan sin coordenadas
+CITY_COORDINATES = {
+    location['city']: (location['latitude'], location['longitude'])
+    for location in locations_lima + locations_provinces
+}
+
+
+class AppendedRows:
+    # Filas de un CSV creciente como lista de bloques: añadir un bloque no copia el historial y
+    # el DataFrame completo solo se arma cuando alguien lo pide (los gráficos de Dash leen solo agregados)
+
+    def __init__(self, chunks):
+        self._chunks = list(chunks)
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    @property
+    def columns(self):
+        return self._chunks[0].columns
+
+    def appended(self, new):
+        # Instantánea nueva; si esta ya se concatenó, se parte del resultado y no de todos los bloques
+        base = [self._frame] if self._frame is not None else self._chunks
+        return AppendedRows([*base, new])
+
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._chunks[0] if len(self._chunks) == 1 else concat_frames(self._chunks)
+            return self._frame
+
+
+class AppendingCsv:
+    # CSV al que los procesos nocturnos solo añaden filas: cada refresco lee únicamente la cola nueva
+
+    def __init__(self, path, specs=CHART_AGGREGATIONS):
+        self.path = path
+        self.specs = specs
+        # (dataset_key, filas, aggs) se reemplaza completo para que los lectores nunca vean un estado a medias;
+        # filas es un AppendedRows: .frame() devuelve el DataFrame
+        self.snapshot = (None, None, {})
+        self._offset = 0
+        self._header = None
+        self._hasher = None
+        self._partials = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _dataset_key(self):
+        # Misma huella que dataset_fingerprint sobre los bytes leídos hasta ahora
+        return (self._hasher.hexdigest(), 'csv', None)
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        # Una última línea sin salto todavía se está escribiendo; se deja para el próximo refresco
+        raw = raw[:raw.rfind(b'\n') + 1]
+        self._header = raw[:raw.find(b'\n') + 1]
+        data = read_csv_typed(raw)
+        self._partials = partial_aggregates(data, self.specs)
+        self._hasher = hashlib.blake2b(raw, digest_size=16)
+        self._offset = len(raw)
+        self.snapshot = (self._dataset_key(), AppendedRows([data]), finalize_partials(self._partials, self.specs))
+        return len(data)
+
+    def _rewritten(self, size):
+        # El archivo se truncó o se reemplazó: la cola ya no continúa lo que se leyó
+        if size < self._offset:
+            return True
+        with open(self.path, 'rb') as f:
+            return f.read(len(self._header)) != self._header
+
+    def refresh(self):
+        # Devuelve el número de filas nuevas incorporadas
+        with self._lock:
+            size = os.path.getsize(self.path)
+            if self._hasher is None or self._rewritten(size):
+                return self._load()
+            if size == self._offset:
+                return 0
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                tail = f.read(size - self._offset)
+            tail = tail[:tail.rfind(b'\n') + 1]
+            if not tail:
+                return 0
+
+            _, rows, _ = self.snapshot
+            new = read_csv_rows(tail, rows.columns)
+            self._partials = merge_partials(self._partials, partial_aggregates(new, self.specs))
+            self._hasher.update(tail)
+            self._offset += len(tail)
+            self.snapshot = (self._dataset_key(), rows.appended(new), finalize_partials(self._partials, self.specs))
+            return len(new)
+
+    def watch(self, interval=30, on_change=None):
+        # Sondeo del tamaño del archivo en un hilo aparte; sin dependencias de notificación del sistema
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh() and on_change is not None:
+                        on_change(self.snapshot)
+                except (OSError, ValueError, pd.errors.ParserError) as e:
+                    print(f"No se pudo leer {self.path}: {e}")
+
+        thread = threading.Thread(target=loop, name="ingesta", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def _map_categories(column, mapping):
+    # Se traducen las categorías, no las filas: el costo es proporcional al número de valores distintos
+    column = column if isinstance(column.dtype, pd.CategoricalDtype) else column.astype('category')
+    categories = np.array([mapping.get(value, value) for value in column.cat.categories], dtype=object)
+    values, inverse = np.unique(categories, return_inverse=True)
+    codes = column.cat.codes.to_numpy()
+    return pd.Series(pd.Categorical.from_codes(np.where(codes >= 0, inverse[codes], -1), categories=values), index=column.index)
+
+
+def _fill_coordinates(data):
+    cities = data['ubicacion_geografica']
+    cities = cities if isinstance(cities.dtype, pd.CategoricalDtype) else cities.astype('category')
+    coordinates = np.array([CITY_COORDINATES.get(city, (np.nan, np.nan)) for city in cities.cat.categories] + [(np.nan, np.nan)])
+    codes = cities.cat.codes.to_numpy()
+    # El código -1 (ubicación vacía) cae en la última fila, sin coordenadas
+    for position, column in enumerate(['latitud', 'longitud']):
+        known = pd.Series(coordinates[codes, position], index=data.index)
+        data[column] = known if column not in data.columns else data[column].fillna(known)
+    return data
+
+
+def normalize_frame(data):
+    # Lleva una exportación al esquema canónico: nombres, valores, coordenadas y orden de columnas
+    data = data.rename(columns=COLUMN_ALIASES)
+    for column, mapping in VALUE_MAPPINGS.items():
+        if column in data.columns:
+            data[column] = _map_categories(data[column], mapping)
+    if 'ubicacion_geografica' in data.columns:
+        data = _fill_coordinates(data)
+    # Las columnas canónicas ausentes quedan vacías y las desconocidas se descartan
+    return apply_schema(data.reindex(columns=fieldnames))
+
+
+def read_normalized(path):
+    return normalize_frame(read_dataset(path, dataset_format(path)))
+
+
+def ingest_files(paths, workers=None):
+    # Lectura en paralelo (el parseo de pandas y pyarrow libera el GIL) y una sola concatenación tipada
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(read_normalized, paths))
+    return apply_schema(concat_frames(frames))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Une exportaciones heterogéneas de varios centros en un único Parquet")
+    parser.add_argument("archivos", nargs='+', help="Archivos CSV, TXT, Parquet o Arrow")
+    parser.add_argument("--salida", default='datos_region.parquet')
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    data = ingest_files(args.archivos, args.procesos)
+    data.to_parquet(args.salida, index=False, compression='zstd')
+    print(f"{len(data)} filas de {len(args.archivos)} archivos escritas en {args.salida}")
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Indicadores por día: (columna, función). Los pacientes se cuentan distintos por día, así que
+# en un rango libre son pacientes-día: los conteos distintos exactos no se pueden restar entre prefijos.
+KPI_MEASURES = {
+    'pacientes': ('id_paciente', 'nunique'),
+    'visitas': ('fecha_visita', 'size'),
+    'facturacion': ('facturacion', 'sum'),
+    'eventos_adversos': ('eventos_adversos', 'sum'),
+}
+
+KPI_LABELS = {
+    'pacientes': "Pacientes",
+    'visitas': "Visitas",
+    'facturacion': "Facturación",
+    'eventos_adversos': "Eventos adversos",
+}
+
+# En un rango personalizado el conteo de pacientes suma los distintos de cada día
+KPI_RANGE_LABELS = {**KPI_LABELS, 'pacientes': "Pacientes-día"}
+
+# Pacientes distintos exactos por semana ISO y por mes calendario: cada paciente cuenta solo el primer
+# día que aparece en el periodo, así que cualquier tramo desde el inicio del periodo es una resta más
+PERIOD_PATIENTS = {'semana': 'pacientes_semana', 'mes': 'pacientes_mes'}
+
+
+def _cumulative(daily):
+    # Sumas acumuladas con una fila inicial de ceros: el total de un rango es una resta
+    dates = daily.index.get_level_values('dia').to_numpy().astype('datetime64[D]')
+    values = np.vstack([np.zeros((1, daily.shape[1])), np.cumsum(daily.to_numpy(dtype=float), axis=0)])
+    return {'dates': dates, 'cumulative': values}
+
+
+def _period_firsts(day, patients, groups=None):
+    # 1 en la primera visita de cada paciente dentro de su semana y de su mes (y de su grupo, si lo hay)
+    days = day.to_numpy().astype('datetime64[D]')
+    keys = {
+        'semana': days - ((days.astype('int64') + 3) % 7),  # 1970-01-01 fue jueves: se vuelve al lunes
+        'mes': days.astype('datetime64[M]'),
+    }
+    order = np.argsort(days, kind='stable')
+    firsts = {}
+    for period, column in PERIOD_PATIENTS.items():
+        frame = pd.DataFrame({'periodo': keys[period], 'paciente': patients.to_numpy()})
+        if groups is not None:
+            frame['grupo'] = groups.to_numpy()
+        flags = np.empty(len(frame), dtype=np.int64)
+        flags[order] = ~frame.iloc[order].duplicated().to_numpy()
+        firsts[column] = flags
+    return pd.DataFrame(firsts, index=day.index)
+
+
+def build_kpi_index(data, by='id_centro_salud', measures=KPI_MEASURES):
+    measures = {name: spec for name, spec in measures.items() if spec[0] in data.columns}
+    day = pd.to_datetime(data['fecha_visita']).dt.floor('D').rename('dia')
+    named = {name: pd.NamedAgg(column=column, aggfunc=func) for name, (column, func) in measures.items()}
+    exact = 'id_paciente' in data.columns
+
+    total = data.groupby(day).agg(**named)
+    if exact:
+        total = total.join(_period_firsts(day, data['id_paciente']).groupby(day).sum())
+    index = {'columns': list(measures), 'total': _cumulative(total), 'groups': {}, 'exact_patients': exact}
+    if by in data.columns:
+        daily = data.groupby([data[by], day], observed=True).agg(**named)
+        if exact:
+            firsts = _period_firsts(day, data['id_paciente'], data[by])
+            daily = daily.join(firsts.groupby([data[by], day], observed=True).sum())
+        for group, table in daily.groupby(level=0, observed=True):
+            index['groups'][group] = _cumulative(table)
+    return index
+
+
+def kpi_range(index, start, end, group=None):
+    # Totales entre start y end, ambos incluidos, con dos búsquedas binarias
+    series = index['total'] if group is None else index['groups'].get(group)
+    if series is None:
+        return dict.fromkeys(index['columns'], 0.0)
+    left = np.searchsorted(series['dates'], np.datetime64(pd.Timestamp(start).date(), 'D'), side='left')
+    right = np.searchsorted(series['dates'], np.datetime64(pd.Timestamp(end).date(), 'D'), side='right')
+    values = series['cumulative'][right] - series['cumulative'][left]
+    columns = index['columns'] + (list(PERIOD_PATIENTS.values()) if index.get('exact_patients') else [])
+    return dict(zip(columns, values))
+
+
+def last_date(index):
+    dates = index['total']['dates']
+    return pd.Timestamp(dates[-1]) if len(dates) else None
+
+
+def period_start(reference, period):
+    if period == 'semana':
+        return reference - pd.Timedelta(days=reference.weekday())
+    return reference.replace(day=1)
+
+
+def period_kpis(index, period='semana', reference=None, group=None):
+    # Periodo en curso hasta la fecha de referencia frente al mismo tramo del periodo anterior
+    reference = pd.Timestamp(reference or last_date(index)).normalize()
+    start = period_start(reference, period)
+    elapsed = reference - start
+    previous_start = start - (pd.Timedelta(weeks=1) if period == 'semana' else pd.DateOffset(months=1))
+    previous_end = min(previous_start + elapsed, start - pd.Timedelta(days=1))
+
+    current = kpi_range(index, start, reference, group)
+    previous = kpi_range(index, previous_start, previous_end, group)
+    if index.get('exact_patients') and 'pacientes' in index['columns']:
+        # Ambos tramos empiezan al inicio de su periodo: el conteo exacto de distintos es válido
+        current['pacientes'] = current[PERIOD_PATIENTS[period]]
+        previous['pacientes'] = previous[PERIOD_PATIENTS[period]]
+    return {
+        name: (current[name], previous[name], current[name] / previous[name] - 1 if previous[name] else None)
+        for name in index['columns']
+    }
@@ -0,0 +1,212 @@
+import base64
+import json
+import re
+
+import numpy as np
+import plotly.graph_objs as go
+
+# A partir de estos puntos las trazas de dispersión SVG pasan a WebGL
+WEBGL_THRESHOLD = 1000
+
+# Decimales que se muestran de cada columna; más precisión no cambia ni el trazo ni el texto emergente
+DISPLAY_PRECISION = {
+    'edad': 0,
+    'duracion_visita': 1,
+    'duracion_promedio': 1,
+    'facturacion': 2,
+    'pago_seguros': 2,
+    'costo_tratamiento': 2,
+    'costos_operacion': 2,
+    'porcentaje_cubierto': 1,
+    'tasa_exito_tratamiento': 1,
+    'satisfaccion_paciente': 1,
+    'seguridad_paciente': 1,
+    'indicadores_desempenio': 1,
+    'cumplimiento_recomendaciones': 1,
+    'tasas_mortalidad': 4,
+    'tasas_morbilidad': 4,
+    'latitud': 4,
+    'longitud': 4,
+}
+
+# Para valores de columnas desconocidas: cifras significativas respecto del mayor valor absoluto del arreglo
+SIGNIFICANT_DIGITS = 6
+
+# Arreglos numéricos que se redondean y, en formato binario, se codifican
+NUMERIC_KEYS = ('x', 'y', 'z', 'lat', 'lon', 'r', 'values', 'base', 'customdata', 'size', 'color',
+                'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean')
+
+# Cajas con al menos estas muestras se envían como estadísticos precalculados si no tienen valores atípicos
+BOX_SAMPLE_THRESHOLD = 1000
+
+# Por debajo de este largo el JSON es igual de compacto que el binario
+BINARY_MIN_LENGTH = 16
+
+# Tipos que plotly.js acepta en {'dtype', 'bdata'}; no admite enteros de 64 bits
+_INTEGER_TYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+_HOVER_FIELD = re.compile(r'([^<>=]+)=%\{([\w.]+)(?:\[(\d+)\])?')
+
+
+def _hover_columns(trace):
+    # px escribe "columna=%{x}" en la plantilla del texto emergente: de ahí sale la columna de cada arreglo
+    columns = {}
+    for column, field, position in _HOVER_FIELD.findall(trace.get('hovertemplate') or ''):
+        field = field.split('.')[-1]
+        columns[(field, int(position)) if position else field] = column.strip()
+    return columns
+
+
+def _round(values, column=None):
+    if values.dtype.kind != 'f' or values.size == 0:
+        return values
+    decimals = DISPLAY_PRECISION.get(column)
+    if decimals is None:
+        largest = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 0
+        decimals = SIGNIFICANT_DIGITS - 1 - int(np.floor(np.log10(largest))) if largest > 0 else 0
+    return np.round(values.astype(np.float64), decimals)
+
+
+def _numeric(value):
+    if isinstance(value, (list, tuple)) and value and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return np.asarray(value, dtype=np.float64)
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'iuf':
+        return value
+    return None
+
+
+def _round_trace(trace):
+    columns = _hover_columns(trace)
+    for owner in (trace, trace.get('marker') or {}):
+        for key in NUMERIC_KEYS:
+            values = _numeric(owner.get(key))
+            if values is None:
+                continue
+            if key == 'customdata' and values.ndim == 2:
+                owner[key] = np.column_stack([_round(values[:, i], columns.get(('customdata', i))) for i in range(values.shape[1])])
+            else:
+                owner[key] = _round(values, columns.get(key))
+
+
+def _to_webgl(trace):
+    # Mismo trazo con el renderizador WebGL; se descartan las propiedades que scattergl no admite
+    valid = go.Scattergl()._valid_props
+    return {**{key: value for key, value in trace.items() if key in valid}, 'type': 'scattergl'}
+
+
+def _collapse_density(trace):
+    # Filas en la misma coordenada se funden en un punto con el peso sumado: el mapa de calor es idéntico
+    lat, lon = np.asarray(trace['lat'], dtype=np.float64), np.asarray(trace['lon'], dtype=np.float64)
+    weights = np.ones(len(lat)) if trace.get('z') is None else np.asarray(trace['z'], dtype=np.float64)
+    drawn = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(weights)
+    points, inverse = np.unique(np.column_stack([lat[drawn], lon[drawn]]), axis=0, return_inverse=True)
+    if len(points) == len(lat):
+        return
+    for key in ('customdata', 'hovertext', 'text'):
+        trace.pop(key, None)
+    trace.update(lat=points[:, 0], lon=points[:, 1], z=np.bincount(inverse.ravel(), weights=weights[drawn], minlength=len(points)))
+
+
+def _interp(values, fraction):
+    # Cuantil como lo calcula plotly.js (Lib.interp, método 'linear'); values ya ordenados
+    position = fraction * len(values) - 0.5
+    if position < 0:
+        return values[0]
+    if position > len(values) - 1:
+        return values[-1]
+    low = int(np.floor(position))
+    high = int(np.ceil(position))
+    return (position - low) * values[high] + (1 - (position - low)) * values[low]
+
+
+def _box_statistics(trace):
+    # Sin valores atípicos la caja queda determinada por cuartiles y bigotes: se envían solo esos cinco números
+    vertical = trace.get('orientation', 'v') != 'h'
+    position_key, value_key = ('x', 'y') if vertical else ('y', 'x')
+    if trace.get('q1') is not None or trace.get('notched') or trace.get('boxmean') == 'sd' or trace.get('boxpoints') in ('all', 'suspectedoutliers'):
+        return
+    values, positions = _numeric(trace.get(value_key)), trace.get(position_key)
+    if values is None or positions is None or len(values) < BOX_SAMPLE_THRESHOLD:
+        return
+    values = values.astype(np.float64)
+    drawn = np.isfinite(values)
+    try:
+        labels, first, codes = np.unique(np.asarray(positions)[drawn], return_index=True, return_inverse=True)
+    except TypeError:
+        return
+    # Las categorías conservan el orden de aparición, que es el que usa el eje
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    codes = rank[codes.ravel()]
+    sort = np.lexsort((values[drawn], codes))
+    ordered = values[drawn][sort]
+    bounds = np.searchsorted(codes[sort], np.arange(len(labels) + 1))
+
+    stats = {'q1': [], 'median': [], 'q3': [], 'lowerfence': [], 'upperfence': [], 'mean': []}
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        group = ordered[start:end]
+        q1, median, q3 = _interp(group, 0.25), _interp(group, 0.5), _interp(group, 0.75)
+        if group[0] < q1 - 1.5 * (q3 - q1) or group[-1] > q3 + 1.5 * (q3 - q1):
+            return
+        for name, value in zip(stats, (q1, median, q3, group[0], group[-1], group.mean())):
+            stats[name].append(value)
+    if not trace.get('boxmean'):
+        del stats['mean']
+    # Los datos por punto solo servían para los puntos, que ya no se dibujan
+    for key in (value_key, 'customdata', 'hovertext', 'text', 'ids'):
+        trace.pop(key, None)
+    if trace.get('hovertemplate'):
+        trace['hovertemplate'] = re.sub(r'(<br>)?[^<>=]+=%\{customdata\[\d+\]\}', '', trace['hovertemplate'])
+    trace.update({position_key: labels[order].tolist(), 'boxpoints': False}, **{name: np.array(v) for name, v in stats.items()})
+
+
+def compact_figure(figure, webgl_threshold=WEBGL_THRESHOLD):
+    # Post-proceso de cualquier figura antes de guardarla: WebGL para nubes grandes y precisión de pantalla
+    spec = figure.to_dict()
+    for i, trace in enumerate(spec['data']):
+        if trace.get('type', 'scatter') == 'scatter' and len(trace.get('x') if trace.get('x') is not None else ()) > webgl_threshold:
+            trace = spec['data'][i] = _to_webgl(trace)
+        if trace.get('type') in ('densitymapbox', 'densitymap') and trace.get('lat') is not None:
+            _collapse_density(trace)
+        if trace.get('type') == 'box':
+            _box_statistics(trace)
+        _round_trace(trace)
+    return go.Figure(spec)
+
+
+def _encode(values):
+    if values.dtype.kind in 'iu' or (values.dtype.kind == 'f' and np.isfinite(values).all() and (values == np.round(values)).all()):
+        low, high = (values.min(), values.max()) if values.size else (0, 0)
+        dtype = next((t for t in _INTEGER_TYPES if np.iinfo(t).min <= low and high <= np.iinfo(t).max), np.float64)
+    else:
+        # float64: el texto emergente muestra el valor tal cual, sin el ruido de convertir a float32.
+        # Ya redondeados, muchos decimales ocupan menos como texto que 8 bytes en base64
+        if len(json.dumps(values.tolist())) <= 4 * -(-values.size * 8 // 3):
+            return None
+        dtype = np.float64
+    encoded = {'dtype': np.dtype(dtype).str.lstrip('<|'), 'bdata': base64.b64encode(values.astype(dtype).tobytes()).decode('ascii')}
+    if values.ndim > 1:
+        encoded['shape'] = ','.join(str(n) for n in values.shape)
+    return encoded
+
+
+def _encode_arrays(spec):
+    for key, value in spec.items():
+        if isinstance(value, dict):
+            _encode_arrays(value)
+            continue
+        values = _numeric(value)
+        if key in NUMERIC_KEYS and values is not None and values.size >= BINARY_MIN_LENGTH and values.ndim <= 2:
+            encoded = _encode(np.ascontiguousarray(values))
+            if encoded is not None:
+                spec[key] = encoded
+
+
+def binary_figure(figure):
+    # Diccionario de la figura con los arreglos numéricos como arreglos tipados de plotly.js (>= 2.28).
+    # Sirve para dcc.Graph; st.plotly_chart vuelve a validar la figura con plotly.py y no los acepta
+    spec = figure.to_dict()
+    for trace in spec['data']:
+        _encode_arrays(trace)
+    return spec
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Etapas medidas por gráfico, en el orden en que ocurren
+STAGES = ['preparacion', 'construccion', 'serializacion']
+
+
+class ChartProfiler:
+    # Tiempos, memoria pico y tamaño de cada gráfico durante una ejecución del panel; solo se crea si se pide
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, chart_id, stage):
+        # Si tracemalloc ya estaba activo (otra etapa en curso) no se mide memoria para no pisar su pico
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        event = {'grafico': chart_id, 'etapa': stage}
+        start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            event['inicio'] = start - self._origin
+            event['segundos'] = time.perf_counter() - start
+            if tracing:
+                event['memoria_pico_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            with self._lock:
+                self.events.append(event)
+
+    def serialize(self, chart_id, figure):
+        # Misma conversión a JSON que hace el navegador al recibir la figura; el tamaño es lo que viaja
+        with self.stage(chart_id, 'serializacion') as event:
+            payload = figure if isinstance(figure, str) else figure.to_json()
+            event['bytes'] = len(payload.encode('utf-8'))
+        return payload
+
+    def table(self):
+        # Una fila por gráfico, de mayor a menor costo total
+        if not self.events:
+            return pd.DataFrame()
+        events = pd.DataFrame(self.events)
+        seconds = events.pivot_table(index='grafico', columns='etapa', values='segundos', aggfunc='sum')
+        seconds = seconds.reindex(columns=[stage for stage in STAGES if stage in seconds.columns])
+        table = seconds.assign(total=seconds.sum(axis=1))
+        if 'memoria_pico_mb' in events.columns:
+            table['memoria_pico_mb'] = events.groupby('grafico')['memoria_pico_mb'].max()
+        if 'bytes' in events.columns:
+            table['bytes'] = events.groupby('grafico')['bytes'].max()
+        if 'cache' in events.columns:
+            table['cache'] = events.groupby('grafico')['cache'].max()
+        return table.sort_values('total', ascending=False).round(4)
+
+    def trace(self):
+        # Formato de eventos de Chrome: se abre en chrome://tracing o en ui.perfetto.dev
+        pid = os.getpid()
+        events = []
+        for event in self.events:
+            args = {key: value for key, value in event.items() if key not in ('grafico', 'etapa', 'inicio', 'segundos')}
+            events.append({
+                'name': f"{event['grafico']} · {event['etapa']}",
+                'cat': event['etapa'],
+                'ph': 'X',
+                'ts': round(event['inicio'] * 1e6),
+                'dur': round(event['segundos'] * 1e6),
+                'pid': pid,
+                'tid': STAGES.index(event['etapa']) if event['etapa'] in STAGES else len(STAGES),
+                'args': args,
+            })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, ensure_ascii=False, default=str)
@@ -0,0 +1,139 @@
+import os
+
+import pandas as pd
+
+from aggregations import CHART_AGGREGATIONS, compute_aggregates
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, cube_aggregates
+from data_loader import read_parquet_typed
+from timeseries import build_rollups
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Medidas derivadas de aggregations._derived_columns, escritas en SQL: (expresión, columnas que necesita)
+DERIVED_SQL = {
+    'porcentaje_cubierto': ('pago_seguros * 100.0 / facturacion', ('pago_seguros', 'facturacion')),
+}
+
+SQL_FUNCTIONS = {
+    'sum': 'SUM({column})',
+    'mean': 'AVG({column})',
+    'size': 'COUNT(*)',
+    'min': 'MIN({column})',
+    'max': 'MAX({column})',
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _spec_columns(specs):
+    columns = set()
+    for keys, measures in specs.values():
+        columns |= set(keys) | {column for column, _ in measures.values()}
+    return columns
+
+
+def _restore_categories(grouped, keys, source):
+    # Las dimensiones de texto vuelven a ser categóricas y se ordenan como lo haría el groupby de pandas
+    categorical = []
+    for key in keys:
+        if isinstance(source, pd.DataFrame) and isinstance(source[key].dtype, pd.CategoricalDtype):
+            grouped[key] = pd.Categorical(grouped[key], categories=source[key].cat.categories)
+            categorical.append(key)
+        elif not pd.api.types.is_numeric_dtype(grouped[key]) and not pd.api.types.is_datetime64_any_dtype(grouped[key]):
+            grouped[key] = grouped[key].astype('category')
+            categorical.append(key)
+    if categorical:
+        grouped = grouped.sort_values(list(keys), kind='stable', ignore_index=True)
+    return grouped
+
+
+def _read_needed(source, specs, extra=()):
+    # source: DataFrame o ruta de un Parquet; del Parquet solo se leen las columnas necesarias
+    if isinstance(source, pd.DataFrame):
+        return source
+    return read_parquet_typed(source, _spec_columns(specs) | {'pago_seguros', 'facturacion'} | set(extra))
+
+
+def pandas_aggregates(source, specs=CHART_AGGREGATIONS):
+    return compute_aggregates(_read_needed(source, specs), specs)
+
+
+def cube_backend(source, specs=CHART_AGGREGATIONS):
+    # Cubo materializado en una pasada; los gráficos sobre sus dimensiones salen de agregar celdas
+    return cube_aggregates(_read_needed(source, specs, CUBE_DIMENSIONS + CUBE_MEASURES), specs)
+
+
+def duckdb_aggregates(source, specs=CHART_AGGREGATIONS, threads=None):
+    # Motor columnar embebido: en el mismo proceso, en paralelo y leyendo el Parquet sin cargarlo en pandas
+    con = duckdb.connect()
+    try:
+        if threads:
+            con.execute(f"SET threads = {int(threads)}")
+        if isinstance(source, pd.DataFrame):
+            con.register('datos', source)
+            available = set(source.columns)
+        else:
+            # La ruta va como argumento de la API, nunca dentro del texto SQL
+            parquet = con.read_parquet(os.fspath(source))
+            parquet.create_view('datos')
+            available = set(parquet.columns)
+        relation = 'datos'
+
+        # Como en _derived_columns: una medida derivada solo existe si la proyección trae sus columnas base
+        derived = {name: sql for name, (sql, bases) in DERIVED_SQL.items() if name not in available and set(bases) <= available}
+
+        def expression(column):
+            return derived.get(column, _quote(column))
+
+        # Como en compute_aggregates: una consulta por combinación de dimensiones
+        by_keys = {}
+        for name, (keys, measures) in specs.items():
+            columns = set(keys) | {column for column, _ in measures.values()}
+            if not columns <= available | set(derived):
+                continue
+            by_keys.setdefault(tuple(keys), []).append((name, measures))
+
+        aggregates = {}
+        for keys, charts in by_keys.items():
+            selects = [_quote(key) for key in keys]
+            for name, measures in charts:
+                for output, (column, func) in measures.items():
+                    selects.append(f"{SQL_FUNCTIONS[func].format(column=expression(column))} AS {_quote(f'{name}__{output}')}")
+            group = ', '.join(_quote(key) for key in keys)
+            not_null = ' AND '.join(f"{_quote(key)} IS NOT NULL" for key in keys)
+            grouped = con.execute(
+                f"SELECT {', '.join(selects)} FROM {relation} WHERE {not_null} GROUP BY {group} ORDER BY {group}"
+            ).df()
+            grouped = _restore_categories(grouped, keys, source)
+
+            for name, measures in charts:
+                table = grouped[list(keys) + [f"{name}__{output}" for output in measures]]
+                aggregates[name] = table.rename(columns={f"{name}__{output}": output for output in measures})
+        return aggregates
+    finally:
+        con.close()
+
+
+BACKENDS = {
+    'cubo': cube_backend,
+    'pandas': pandas_aggregates,
+    'duckdb': duckdb_aggregates,
+}
+
+
+def available_backends():
+    return [name for name in BACKENDS if name != 'duckdb' or duckdb is not None]
+
+
+def run_aggregates(source, specs=CHART_AGGREGATIONS, backend='cubo'):
+    if backend not in available_backends():
+        raise ValueError(f"Motor de agregación no disponible: {backend}")
+    aggregates = BACKENDS[backend](source, specs)
+    # Series por día, semana y mes derivadas de las tablas diarias, sin volver a recorrer las filas
+    aggregates.update(build_rollups(aggregates))
+    return aggregates
@@ -0,0 +1,157 @@
+import argparse
+import html
+import json
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.graph_objs as go
+import plotly.offline
+
+from aggregations import CHART_AGGREGATIONS, DIMENSION_AGGREGATIONS, PATHWAY_STAGES, pathway_links
+from charts import PANEL_CHARTS, sankey_chart
+from cube import build_cube, cube_aggregates
+from data_loader import dataset_format, read_dataset
+from filters import build_filter_index, filter_mask
+from payload import compact_figure
+from sampling import DEFAULT_POINT_BUDGET
+from timeseries import build_rollups
+
+# Paneles de main() en app.py que entran en el informe
+REPORT_PANELS = ["Información general", "Análisis financiero", "Análisis de calidad"]
+
+REPORT_SPECS = {**CHART_AGGREGATIONS, **DIMENSION_AGGREGATIONS}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _slug(text):
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return text.lower().replace(' ', '_')
+
+
+def images_available(image_format='png'):
+    # La exportación estática depende de kaleido y de un navegador sin interfaz
+    try:
+        go.Figure().to_image(format=image_format)
+        return True
+    except Exception:
+        return False
+
+
+def panel_figures(data, aggs, panel, point_budget=DEFAULT_POINT_BUDGET):
+    figures, errors = {}, {}
+    for chart_id, builder in PANEL_CHARTS[panel].items():
+        try:
+            figures[chart_id] = compact_figure(builder(data, aggs, point_budget))
+        except Exception as e:
+            errors[chart_id] = f"{type(e).__name__}: {e}"
+    if panel == "Análisis de calidad" and set(PATHWAY_STAGES) <= set(data.columns):
+        figures['trayectorias'] = compact_figure(sankey_chart(pathway_links(data, PATHWAY_STAGES)))
+    return figures, errors
+
+
+def write_page(path, title, figures):
+    # plotly.js se comparte desde la raíz del informe: las páginas funcionan sin conexión
+    parts = [
+        fig.to_html(full_html=False, include_plotlyjs='../plotly.min.js' if i == 0 else False)
+        for i, fig in enumerate(figures.values())
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title=html.escape(title), body='\n'.join(parts)))
+
+
+def export_scope(task):
+    # Un ámbito (todos los centros o uno) por proceso: agregados desde el corte del cubo y luego cada panel
+    name, title, data, cube, output, point_budget, image_format = task
+    start = time.perf_counter()
+    aggs = cube_aggregates(data, REPORT_SPECS, cube)
+    aggs.update(build_rollups(aggs))
+
+    directory = os.path.join(output, name)
+    os.makedirs(directory, exist_ok=True)
+    result = {'ambito': name, 'filas': len(data), 'paginas': [], 'errores': {}}
+    for panel in REPORT_PANELS:
+        figures, errors = panel_figures(data, aggs, panel, point_budget)
+        page = os.path.join(name, f"{_slug(panel)}.html")
+        write_page(os.path.join(output, page), f"{panel} · {title}", figures)
+        result['paginas'].append({'panel': panel, 'archivo': page})
+        if image_format:
+            image_dir = os.path.join(directory, _slug(panel))
+            os.makedirs(image_dir, exist_ok=True)
+            for chart_id, fig in figures.items():
+                try:
+                    fig.write_image(os.path.join(image_dir, f"{chart_id}.{image_format}"))
+                except Exception as e:
+                    errors[chart_id] = f"{type(e).__name__}: {e}"
+        result['errores'].update(errors)
+    result['segundos'] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def report_scopes(data, by_centre=False):
+    # El cubo se construye una vez; cada centro recibe sus filas y su corte del cubo
+    cube = build_cube(data)
+    scopes = [('general', "Todos los centros", data, cube)]
+    if by_centre and 'id_centro_salud' in data.columns:
+        index = build_filter_index(data, ['id_centro_salud'])
+        for centre in index['values']['id_centro_salud']:
+            rows = data[filter_mask(index, {'id_centro_salud': [centre]})].reset_index(drop=True)
+            scopes.append((f"centro_{centre}", f"Centro {centre}", rows, cube[cube['id_centro_salud'] == centre]))
+    return scopes
+
+
+def write_index(output, results):
+    items = []
+    for result in results:
+        links = ' · '.join(f'<a href="{html.escape(page["archivo"])}">{html.escape(page["panel"])}</a>' for page in result['paginas'])
+        items.append(f"<li>{html.escape(result['ambito'])} ({result['filas']:,} filas): {links}</li>")
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title="Informe de paneles", body=f"<ul>\n{chr(10).join(items)}\n</ul>"))
+    with open(os.path.join(output, 'informe.json'), 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def export_reports(source, output, by_centre=False, image_format=None, point_budget=DEFAULT_POINT_BUDGET, workers=None):
+    data = read_dataset(source, dataset_format(source))
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(plotly.offline.get_plotlyjs())
+
+    if image_format and not images_available(image_format):
+        print("Aviso: kaleido no puede generar imágenes en este entorno; se exporta solo HTML")
+        image_format = None
+
+    tasks = [(*scope, output, point_budget, image_format) for scope in report_scopes(data, by_centre)]
+    if workers == 1 or len(tasks) == 1:
+        results = list(map(export_scope, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(export_scope, tasks))
+    write_index(output, results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta los gráficos de los paneles a HTML e imágenes estáticas")
+    parser.add_argument("datos", help="Archivo CSV, Parquet o Arrow")
+    parser.add_argument("--salida", default='informe')
+    parser.add_argument("--por-centro", action='store_true', help="Genera además un informe por centro de salud")
+    parser.add_argument("--imagenes", choices=['png', 'svg', 'pdf'], default=None, help="Formato de las imágenes estáticas")
+    parser.add_argument("--puntos", type=int, default=DEFAULT_POINT_BUDGET, help="Presupuesto de puntos por gráfico")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = export_reports(args.datos, args.salida, args.por_centro, args.imagenes, args.puntos, args.procesos)
+    errors = sum(len(result['errores']) for result in results)
+    print(f"{len(results)} informes en {args.salida} ({time.perf_counter() - start:.1f} s, {errors} gráficos con error)")
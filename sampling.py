@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objs as go
+from plotly.subplots import make_subplots
+
+# Puntos que se envían al navegador por gráfico y tamaño a partir del cual se rasteriza
+DEFAULT_POINT_BUDGET = 5000
+RASTER_THRESHOLD = 500_000
+MIN_POINTS_PER_GROUP = 200
+
+
+def stratified_sample(data, budget=DEFAULT_POINT_BUDGET, by=None, min_per_group=MIN_POINTS_PER_GROUP, seed=0):
+    if len(data) <= budget:
+        return data
+    rng = np.random.default_rng(seed)
+    if not by:
+        return data.iloc[np.sort(rng.choice(len(data), budget, replace=False))]
+
+    # Cuota proporcional por estrato; los grupos pequeños conservan un mínimo de puntos,
+    # acotado para que el total no supere dos veces el presupuesto. Los valores ausentes forman su propio estrato
+    codes = data.groupby(by, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    sizes = np.bincount(codes)
+    floor = min(min_per_group, budget // len(sizes))
+    quota = np.minimum(sizes, np.maximum(floor, np.floor(budget * sizes / len(data))))
+
+    order = rng.permutation(len(data))
+    shuffled_codes = codes[order]
+    sort = np.argsort(shuffled_codes, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    ranks = np.empty(len(data), dtype=np.int64)
+    ranks[sort] = np.arange(len(data)) - starts[shuffled_codes[sort]]
+
+    keep = order[ranks < quota[shuffled_codes]]
+    return data.iloc[np.sort(keep)]
+
+
+def density_figure(data, x, y, bins=300, title=None):
+    # Rasterizado en el servidor: se envía una rejilla de conteos en vez de los puntos.
+    # Las filas sin coordenadas (p. ej. ciudades desconocidas al ingerir) no se dibujan
+    x_values = data[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_values = data[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    drawn = np.isfinite(x_values) & np.isfinite(y_values)
+    if not drawn.any():
+        return go.Figure().update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    counts, x_edges, y_edges = np.histogram2d(x_values[drawn], y_values[drawn], bins=bins)
+    counts[counts == 0] = np.nan
+    fig = go.Figure(go.Heatmap(
+        z=counts.T,
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        colorscale="Viridis",
+        colorbar=dict(title="Pacientes"),
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def budgeted_scatter(data, x, y, budget=DEFAULT_POINT_BUDGET, by=None, raster_threshold=RASTER_THRESHOLD, **kwargs):
+    if len(data) > raster_threshold:
+        return density_figure(data, x, y, title=kwargs.get('title'))
+    return px.scatter(stratified_sample(data, budget, by), x=x, y=y, **kwargs)
+
+
+def budgeted_histogram(data, x, color, budget=DEFAULT_POINT_BUDGET, nbins=50, title=None, colors=None):
+    # Histograma apilado por grupo con los conteos calculados en el servidor: tantas barras como
+    # intervalos por grupo, sea cual sea el número de filas. El violín marginal usa una muestra estratificada
+    values = data[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    groups = data[color].astype(object).where(data[color].notna(), "Sin dato").astype(str)
+    codes, labels = pd.factorize(groups, sort=True)
+    drawn = np.isfinite(values)
+    edges = np.histogram_bin_edges(values[drawn], bins=nbins) if drawn.any() else np.array([0.0, 1.0])
+    bins = np.clip(np.searchsorted(edges, values[drawn], side='right') - 1, 0, len(edges) - 2)
+    counts = np.bincount(codes[drawn] * (len(edges) - 1) + bins, minlength=len(labels) * (len(edges) - 1)).reshape(len(labels), -1)
+
+    colors = colors or px.colors.qualitative.Plotly
+    sample = stratified_sample(data.assign(**{color: groups}), budget, by=color)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.26, 0.74], vertical_spacing=0.03)
+    for i, label in enumerate(labels):
+        shade = colors[i % len(colors)]
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2, y=counts[i], width=np.diff(edges), name=label, legendgroup=label,
+            marker_color=shade, customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate=f"{color}={label}<br>{x}=%{{customdata[0]:.4g}} - %{{customdata[1]:.4g}}<br>count=%{{y}}<extra></extra>",
+        ), row=2, col=1)
+        fig.add_trace(go.Violin(
+            x=sample.loc[sample[color] == label, x], name=label, legendgroup=label, showlegend=False,
+            orientation='h', line_color=shade, hoverinfo='skip',
+        ), row=1, col=1)
+    fig.update_layout(title=title, barmode='relative', bargap=0, violinmode='overlay')
+    fig.update_xaxes(title_text=x, row=2, col=1)
+    fig.update_yaxes(title_text="count", row=2, col=1)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    return fig
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+RANGE_COLUMNS = ['edad', 'fecha_visita']
+
+
+def _sorted_index(values):
+    order = np.argsort(values, kind='stable')
+    return {'values': values[order], 'order': order}
+
+
+def build_search_index(data):
+    # Índices construidos una vez por dataset; las consultas no vuelven a recorrer la tabla
+    index = {'rows': len(data), 'id': _sorted_index(data['id_paciente'].to_numpy()), 'range': {}, 'inverted': {}}
+
+    for column in RANGE_COLUMNS:
+        if column in data.columns:
+            index['range'][column] = _sorted_index(data[column].to_numpy())
+
+    for column in data.columns:
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            codes = data[column].cat.codes.to_numpy()
+            order = np.argsort(codes, kind='stable')
+            # Posiciones de la lista invertida de cada categoría dentro de `order`
+            bounds = np.searchsorted(codes[order], np.arange(len(data[column].cat.categories) + 1))
+            index['inverted'][column] = {
+                'codes': {value: i for i, value in enumerate(data[column].cat.categories)},
+                'order': order,
+                'bounds': bounds,
+            }
+    return index
+
+
+def lookup_patient(index, patient_id):
+    ids = index['id']
+    start = np.searchsorted(ids['values'], patient_id, side='left')
+    end = np.searchsorted(ids['values'], patient_id, side='right')
+    return np.sort(ids['order'][start:end])
+
+
+def _range_rows(index, column, low=None, high=None):
+    sorted_index = index['range'][column]
+    start = 0 if low is None else np.searchsorted(sorted_index['values'], low, side='left')
+    end = len(sorted_index['values']) if high is None else np.searchsorted(sorted_index['values'], high, side='right')
+    return sorted_index['order'][start:end]
+
+
+def _category_rows(index, column, values):
+    inverted = index['inverted'][column]
+    postings = []
+    for value in values:
+        code = inverted['codes'].get(value)
+        if code is not None:
+            postings.append(inverted['order'][inverted['bounds'][code]:inverted['bounds'][code + 1]])
+    return np.concatenate(postings) if postings else np.empty(0, dtype=np.int64)
+
+
+def search(index, categories=None, ranges=None):
+    # categories: {columna: [valores]}; ranges: {columna: (mínimo, máximo)}, ambos extremos incluidos
+    candidates = []
+    for column, values in (categories or {}).items():
+        if values:
+            candidates.append(_category_rows(index, column, values))
+    for column, (low, high) in (ranges or {}).items():
+        candidates.append(_range_rows(index, column, low, high))
+
+    if not candidates:
+        return np.arange(index['rows'])
+
+    # Se intersecta empezando por la lista más corta
+    candidates.sort(key=len)
+    rows = np.sort(candidates[0])
+    for other in candidates[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
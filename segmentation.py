@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage
+from sklearn.cluster import MiniBatchKMeans
+
+# Variables demográficas, clínicas y financieras con las que se agrupa a los pacientes
+SEGMENT_NUMERIC = [
+    'edad', 'duracion_visita', 'visitas_seguimiento', 'tasa_exito_tratamiento',
+    'satisfaccion_paciente', 'facturacion', 'pago_seguros', 'costo_tratamiento',
+]
+SEGMENT_NOMINAL = ['genero', 'raza', 'enfermedades_cronicas']
+# Categóricas con orden propio: se codifican como un único número en vez de una columna por valor
+SEGMENT_ORDINAL = {'nivel_socioeconomico': ['A', 'B', 'C', 'D', 'E']}
+
+SEGMENT_COLUMNS = (*SEGMENT_NUMERIC, *SEGMENT_NOMINAL, *SEGMENT_ORDINAL)
+
+DEFAULT_SEGMENTS = 6
+
+# Lote de MiniBatchKMeans y filas con las que se ajusta; el resto solo se asigna al centroide más cercano
+BATCH_SIZE = 8192
+FIT_SAMPLE = 200_000
+
+
+def category_levels(data, columns):
+    # Vocabulario de cada categórica: el orden fijo de las ordinales o las categorías presentes en los datos
+    levels = {}
+    for column in columns:
+        if column in SEGMENT_ORDINAL:
+            values = SEGMENT_ORDINAL[column]
+        elif isinstance(data[column].dtype, pd.CategoricalDtype):
+            values = data[column].cat.categories.tolist()
+        else:
+            values = sorted(data[column].dropna().unique().tolist())
+        if values:
+            levels[column] = values
+    return levels
+
+
+def encode_categories(data, levels):
+    # Códigos de las categóricas de pandas traducidos al orden del vocabulario con una tabla de consulta,
+    # sin pasar cada fila por objetos de Python; -1 marca valores ausentes o desconocidos
+    codes = np.empty((len(data), len(levels)), dtype=np.int16)
+    for i, (column, values) in enumerate(levels.items()):
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            lookup = np.append(pd.Index(values).get_indexer(data[column].cat.categories), -1)
+            codes[:, i] = lookup[data[column].cat.codes.to_numpy()]
+        else:
+            codes[:, i] = pd.Index(values).get_indexer(data[column])
+    return codes
+
+
+def feature_matrix(data, levels, numeric):
+    # Numéricas estandarizadas, ordinales escaladas y una columna 0/1 por valor de cada nominal
+    parts, names = [], []
+    for column in numeric:
+        values = data[column].to_numpy(dtype=np.float32, na_value=np.nan)
+        center, scale = np.nanmean(values), np.nanstd(values)
+        parts.append(np.nan_to_num((values - center) / (scale or 1), nan=0.0)[:, None])
+        names.append(column)
+    codes = encode_categories(data, levels)
+    for i, (column, values) in enumerate(levels.items()):
+        count = len(values)
+        if column in SEGMENT_ORDINAL:
+            ranks = codes[:, i].astype(np.float32)
+            ranks[codes[:, i] < 0] = np.nan
+            center, scale = np.nanmean(ranks), np.nanstd(ranks)
+            parts.append(np.nan_to_num((ranks - center) / (scale or 1), nan=0.0)[:, None])
+            names.append(column)
+        else:
+            # La fila extra de la identidad recoge el código -1 y se descarta: los ausentes quedan en cero
+            parts.append(np.eye(count + 1, dtype=np.float32)[codes[:, i]][:, :count])
+            names.extend(f"{column}={value}" for value in values)
+    return np.hstack(parts), names, codes
+
+
+def segment_profile(data, labels, codes, levels, numeric, segments):
+    # Promedios en unidades originales y categoría más frecuente de cada segmento, con bincount
+    sizes = np.bincount(labels, minlength=segments)
+    profile = pd.DataFrame({'segmento': [f"Segmento {i + 1}" for i in range(segments)], 'pacientes': sizes})
+    for column in numeric:
+        values = data[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        drawn = ~np.isnan(values)
+        totals = np.bincount(labels[drawn], weights=values[drawn], minlength=segments)
+        profile[column] = totals / np.maximum(np.bincount(labels[drawn], minlength=segments), 1)
+    for i, (column, values) in enumerate(levels.items()):
+        count = len(values)
+        drawn = codes[:, i] >= 0
+        table = np.bincount(labels[drawn] * count + codes[drawn, i], minlength=segments * count).reshape(segments, count)
+        profile[column] = np.asarray(values, dtype=object)[table.argmax(axis=1)]
+    return profile
+
+
+def segment_patients(data, segments=DEFAULT_SEGMENTS, seed=0):
+    missing = [column for column in SEGMENT_COLUMNS if column not in data.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas para la segmentación: {', '.join(missing)}")
+
+    numeric = SEGMENT_NUMERIC
+    levels = category_levels(data, [*SEGMENT_NOMINAL, *SEGMENT_ORDINAL])
+    features, names, codes = feature_matrix(data, levels, numeric)
+
+    # Ajuste por minilotes sobre una muestra acotada; asignar el resto es un producto de matrices
+    rng = np.random.default_rng(seed)
+    fit_rows = rng.choice(len(features), FIT_SAMPLE, replace=False) if len(features) > FIT_SAMPLE else slice(None)
+    model = MiniBatchKMeans(n_clusters=segments, batch_size=BATCH_SIZE, n_init=3, random_state=seed)
+    model.fit(features[fit_rows])
+    labels = model.predict(features)
+
+    # Segmento 1 es el más numeroso
+    order = np.argsort(-np.bincount(labels, minlength=segments), kind='stable')
+    rank = np.empty(segments, dtype=np.int64)
+    rank[order] = np.arange(segments)
+    labels = rank[labels].astype(np.int16)
+    centroids = model.cluster_centers_[order]
+
+    profile = segment_profile(data, labels, codes, levels, numeric, segments)
+    # Perfil estandarizado de las numéricas: distancia de cada segmento al promedio general en desviaciones
+    means = profile[numeric]
+    overall = pd.Series({column: np.nanmean(data[column].to_numpy(dtype=np.float64, na_value=np.nan)) for column in numeric})
+    spread = pd.Series({column: np.nanstd(data[column].to_numpy(dtype=np.float64, na_value=np.nan)) for column in numeric})
+    standardized = ((means - overall) / spread.replace(0, 1)).set_axis(profile['segmento'])
+
+    return {
+        'modelo': model,
+        'categorias': levels,
+        'variables': names,
+        'etiquetas': labels,
+        'perfil': profile,
+        'perfil_estandarizado': standardized,
+        # El dendrograma se construye solo sobre los centroides: k puntos en lugar de una matriz n x n
+        'enlace': linkage(centroids, method='ward'),
+    }
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregations import CHART_AGGREGATIONS, PATHWAY_STAGES, finalize_partials, merge_partials, partial_aggregates
+from data_loader import CATEGORICAL_COLUMNS, DATE_COLUMNS, _as_buffer, apply_schema
+from timeseries import build_rollups
+
+# A partir de este tamaño los paneles financiero y de calidad procesan el CSV por bloques
+STREAMING_THRESHOLD_BYTES = 256 * 2**20
+
+# Filas de muestra uniforme que se conservan para los gráficos de dispersión
+STREAM_SAMPLE_SIZE = 20_000
+
+# Error relativo de los cuantiles aproximados
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+# Cubeta reservada para ceros y negativos, que se reportan como 0
+_ZERO_BUCKET = -(2**31)
+
+# Distribuciones resumidas con cuantiles: nombre -> (dimensiones, columna)
+QUANTILE_SKETCHES = {
+    'distribucion_facturacion_centro': (['id_centro_salud'], 'facturacion'),
+}
+
+# Conteo de trayectorias completas, para el diagrama de Sankey sin cargar las filas
+PATHWAY_AGGREGATIONS = {
+    'trayectorias': (PATHWAY_STAGES, {'pacientes': (PATHWAY_STAGES[0], 'size')}),
+}
+
+
+def sketch_chunk(data, keys, column):
+    # Cubetas logarítmicas (como DDSketch): cada cuantil queda dentro del error relativo pedido
+    values = data[column].to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    buckets = np.full(len(values), _ZERO_BUCKET, dtype=np.int64)
+    positive = valid & (values > 0)
+    buckets[positive] = np.ceil(np.log(values[positive]) / np.log(_GAMMA))
+    frame = data.loc[valid, keys].assign(cubeta=buckets[valid])
+    return frame.groupby(keys + ['cubeta'], observed=True).size()
+
+
+def merge_sketches(left, right):
+    merged = dict(left)
+    for name, counts in right.items():
+        if name in merged:
+            combined = pd.concat([merged[name], counts])
+            counts = combined.groupby(level=list(range(combined.index.nlevels)), observed=True).sum()
+        merged[name] = counts
+    return merged
+
+
+def sketch_quantiles(counts, keys, quantiles=(0, 0.25, 0.5, 0.75, 1)):
+    rows = []
+    for group, group_counts in counts.groupby(level=list(range(len(keys))), observed=True):
+        group_counts = group_counts.sort_index(level='cubeta')
+        buckets = group_counts.index.get_level_values('cubeta').to_numpy()
+        cumulative = np.cumsum(group_counts.to_numpy())
+        # Valor representativo de cada cubeta: punto medio en escala relativa
+        values = np.where(buckets == _ZERO_BUCKET, 0.0, 2 * _GAMMA ** buckets.astype(float) / (_GAMMA + 1))
+        positions = np.searchsorted(cumulative, np.asarray(quantiles) * (cumulative[-1] - 1), side='right')
+        group = group if isinstance(group, tuple) else (group,)
+        rows.append((*group, *values[positions], int(cumulative[-1])))
+    return pd.DataFrame(rows, columns=[*keys, *[f"q{int(q * 100)}" for q in quantiles], 'pacientes'])
+
+
+def box_statistics(sketches, specs=QUANTILE_SKETCHES):
+    tables = {}
+    for name, counts in sketches.items():
+        keys, _ = specs[name]
+        table = sketch_quantiles(counts, keys)
+        tables[name] = table.rename(columns={'q0': 'minimo', 'q25': 'q1', 'q50': 'mediana', 'q75': 'q3', 'q100': 'maximo'})
+    return tables
+
+
+def _bottom_k(sample, chunk, size, rng):
+    # Muestra uniforme fusionable: se conservan las filas con las claves aleatorias más pequeñas
+    chunk = chunk.assign(_clave=rng.random(len(chunk))).nsmallest(size, '_clave')
+    if sample is None:
+        return chunk
+    return pd.concat([sample, chunk], ignore_index=True).nsmallest(size, '_clave')
+
+
+def stream_csv(source, usecols=None, specs=CHART_AGGREGATIONS, sketches=QUANTILE_SKETCHES,
+               chunksize=250_000, sample_size=STREAM_SAMPLE_SIZE, seed=0, progress=None):
+    # Un solo recorrido del CSV por bloques; la memoria depende del bloque y de los resúmenes, no del archivo
+    buffer = _as_buffer(source)
+    handle = open(buffer, 'rb') if isinstance(buffer, (str, os.PathLike)) else buffer
+    try:
+        handle.seek(0, os.SEEK_END)
+        total = handle.tell()
+        handle.seek(0)
+        columns = pd.read_csv(handle, nrows=0).columns
+        if usecols is not None:
+            columns = [column for column in columns if column in usecols]
+        handle.seek(0)
+
+        specs = {**specs, **{name: spec for name, spec in PATHWAY_AGGREGATIONS.items() if set(spec[0]) <= set(columns)}}
+        sketches = {name: spec for name, spec in sketches.items() if set(spec[0]) | {spec[1]} <= set(columns)}
+
+        reader = pd.read_csv(
+            handle,
+            usecols=list(columns),
+            chunksize=chunksize,
+            dtype={column: 'category' for column in CATEGORICAL_COLUMNS if column in columns},
+            parse_dates=[column for column in DATE_COLUMNS if column in columns],
+        )
+        rng = np.random.default_rng(seed)
+        partials, sketch_counts, sample, rows = {}, {}, None, 0
+        for chunk in reader:
+            chunk = apply_schema(chunk)
+            partials = merge_partials(partials, partial_aggregates(chunk, specs))
+            sketch_counts = merge_sketches(sketch_counts, {
+                name: sketch_chunk(chunk, keys, column) for name, (keys, column) in sketches.items()
+            })
+            sample = _bottom_k(sample, chunk, sample_size, rng)
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, min(handle.tell() / total, 1.0) if total else 1.0)
+    finally:
+        if handle is not buffer:
+            handle.close()
+
+    aggs = finalize_partials(partials, specs)
+    aggs.update(box_statistics(sketch_counts, sketches))
+    aggs.update(build_rollups(aggs))
+    sample = apply_schema(sample.drop(columns='_clave').reset_index(drop=True)) if sample is not None else None
+    return {'rows': rows, 'aggs': aggs, 'sample': sample}
+
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import datosgen
+from aggregations import CHART_AGGREGATIONS, DIMENSION_AGGREGATIONS, compute_aggregates
+from cube import cube_aggregates
+from data_loader import apply_schema, read_csv_typed
+from filters import build_filter_index, filter_mask
+from ingest import AppendingCsv
+from query_backend import duckdb, duckdb_aggregates
+from streaming import stream_csv
+
+SPECS = {**CHART_AGGREGATIONS, **DIMENSION_AGGREGATIONS}
+
+
+@pytest.fixture(scope='module')
+def data():
+    return apply_schema(datosgen.generate_dataset(20_000, seed=5, chunk_size=7_000, workers=1, reference_date='2024-06-30'))
+
+
+@pytest.fixture(scope='module')
+def csv_path(data, tmp_path_factory):
+    path = tmp_path_factory.mktemp('datos') / 'datos.csv'
+    data.to_csv(path, index=False)
+    return path
+
+
+def _normalized(table, keys):
+    # Mismo contenido sin depender del orden de filas ni de si las claves son categóricas
+    table = table.astype({column: object for column in keys if isinstance(table[column].dtype, pd.CategoricalDtype)})
+    return table.sort_values(keys, ignore_index=True)
+
+
+def assert_same_aggregates(expected, actual, names):
+    # Los promedios sobre columnas float32 difieren en el último dígito según el orden de la suma
+    for name in names:
+        keys = SPECS[name][0]
+        left, right = _normalized(expected[name], keys), _normalized(actual[name], keys)
+        pd.testing.assert_frame_equal(left, right[left.columns], check_dtype=False, check_exact=False, rtol=1e-6, obj=name)
+
+
+def test_cube_matches_compute_aggregates(data):
+    expected = compute_aggregates(data, SPECS)
+    assert_same_aggregates(expected, cube_aggregates(data, SPECS), expected)
+
+
+@pytest.fixture(scope='module')
+def data_with_gaps(data):
+    # Celdas en blanco en varias dimensiones del cubo y una exportación sin la columna raza
+    rng = np.random.default_rng(11)
+    gaps = data.copy()
+    for column, share in [('procedimientos_realizados', 0.1), ('genero', 0.02), ('nivel_socioeconomico', 0.05)]:
+        gaps.loc[rng.random(len(gaps)) < share, column] = np.nan
+    gaps['id_centro_salud'] = gaps['id_centro_salud'].astype(float)
+    gaps.loc[rng.random(len(gaps)) < 0.03, 'id_centro_salud'] = np.nan
+    gaps['raza'] = pd.Categorical([np.nan] * len(gaps))
+    return gaps
+
+
+def test_cube_keeps_rows_with_missing_dimensions(data_with_gaps):
+    expected = compute_aggregates(data_with_gaps, SPECS)
+    actual = cube_aggregates(data_with_gaps, SPECS)
+    assert actual['pacientes_nse']['pacientes'].sum() == data_with_gaps['nivel_socioeconomico'].notna().sum()
+    assert_same_aggregates(expected, actual, expected)
+
+
+@pytest.mark.skipif(duckdb is None, reason="duckdb no está instalado")
+def test_duckdb_matches_compute_aggregates(data):
+    expected = compute_aggregates(data, SPECS)
+    actual = duckdb_aggregates(data, SPECS)
+    assert set(actual) == set(expected)
+    assert_same_aggregates(expected, actual, expected)
+
+
+def test_streamed_aggregates_match_full_load(data, csv_path):
+    summary = stream_csv(csv_path, chunksize=3_000)
+    expected = compute_aggregates(read_csv_typed(csv_path))
+    assert summary['rows'] == len(data)
+    assert_same_aggregates(expected, summary['aggs'], expected)
+
+
+def test_streamed_quantiles_stay_within_sketch_accuracy(data, csv_path):
+    stats = stream_csv(csv_path, chunksize=3_000)['aggs']['distribucion_facturacion_centro'].set_index('id_centro_salud')
+    exact = data.groupby('id_centro_salud')['facturacion']
+    for column, quantile in [('mediana', 0.5), ('minimo', 0), ('maximo', 1)]:
+        # El cuantil del boceto está a menos del 1 % de algún valor cercano al rango exacto
+        np.testing.assert_allclose(stats[column], exact.quantile(quantile).reindex(stats.index), rtol=0.02)
+
+
+def test_appended_rows_match_a_full_reload(data, tmp_path):
+    path = tmp_path / 'creciente.csv'
+    data.iloc[:12_000].to_csv(path, index=False)
+    growing = AppendingCsv(path, SPECS)
+    assert growing.refresh() == 12_000
+    data.iloc[12_000:].to_csv(path, mode='a', header=False, index=False)
+    assert growing.refresh() == 8_000
+
+    fresh = AppendingCsv(path, SPECS)
+    fresh.refresh()
+    assert growing.snapshot[0] == fresh.snapshot[0]
+    pd.testing.assert_frame_equal(growing.snapshot[1].frame(), fresh.snapshot[1].frame(), check_categorical=False)
+    expected = compute_aggregates(read_csv_typed(path), SPECS)
+    assert_same_aggregates(expected, growing.snapshot[2], expected)
+
+
+@pytest.mark.parametrize('selection', [
+    {'genero': ['F']},
+    {'id_centro_salud': [1, 3], 'nivel_socioeconomico': ['A', 'E']},
+    {'fecha_visita': ('2024-02-10', '2024-04-20'), 'ubicacion_geografica': ['Lima', 'Cusco']},
+    {'fecha_visita': ('2024-03-01', '2024-03-31')},
+    {'genero': ['X']},
+])
+def test_filter_mask_matches_pandas(data, selection):
+    expected = np.ones(len(data), dtype=bool)
+    for column, values in selection.items():
+        if column == 'fecha_visita':
+            day = data[column].dt.normalize()
+            expected &= ((day >= pd.Timestamp(values[0])) & (day <= pd.Timestamp(values[1]))).to_numpy()
+        else:
+            expected &= data[column].isin(values).to_numpy()
+    np.testing.assert_array_equal(filter_mask(build_filter_index(data), selection), expected)
+
+
+def test_filter_mask_without_selection_is_none(data):
+    assert filter_mask(build_filter_index(data), {}) is None
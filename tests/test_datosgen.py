@@ -0,0 +1,17 @@
+import pandas as pd
+
+import datosgen
+
+
+def test_same_seed_and_date_give_the_same_rows():
+    first = datosgen.generate_dataset(2000, seed=7, chunk_size=700, workers=1, reference_date='2024-06-30')
+    second = datosgen.generate_dataset(2000, seed=7, chunk_size=700, workers=1, reference_date='2024-06-30')
+    pd.testing.assert_frame_equal(first, second)
+    assert first['fecha_visita'].max() <= pd.Timestamp('2024-06-30')
+    assert first['fecha_visita'].min() >= pd.Timestamp('2023-06-30')
+
+
+def test_parallel_chunks_arrive_in_plan_order():
+    serial = datosgen.generate_dataset(5000, seed=4, chunk_size=600, workers=1, reference_date='2024-06-30')
+    parallel = datosgen.generate_dataset(5000, seed=4, chunk_size=600, workers=2, reference_date='2024-06-30')
+    pd.testing.assert_frame_equal(serial, parallel)
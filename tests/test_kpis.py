@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpis import build_kpi_index, period_kpis, period_start
+
+
+@pytest.fixture
+def visits():
+    rng = np.random.default_rng(3)
+    rows = 5000
+    return pd.DataFrame({
+        'id_paciente': rng.integers(0, 300, rows),
+        'id_centro_salud': rng.integers(1, 4, rows),
+        'fecha_visita': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 120, rows), unit='D'),
+        'facturacion': rng.integers(800, 3000, rows),
+        'eventos_adversos': rng.integers(0, 3, rows),
+    })
+
+
+def _distinct(data, start, end, group=None):
+    rows = data[(data['fecha_visita'] >= start) & (data['fecha_visita'] <= end)]
+    if group is not None:
+        rows = rows[rows['id_centro_salud'] == group]
+    return rows['id_paciente'].nunique()
+
+
+@pytest.mark.parametrize('period', ['semana', 'mes'])
+@pytest.mark.parametrize('group', [None, 2])
+def test_period_patients_are_exact_distinct_counts(visits, period, group):
+    index = build_kpi_index(visits)
+    for reference in pd.to_datetime(['2024-02-14', '2024-03-31', '2024-04-29']):
+        start = period_start(reference, period)
+        current, previous, _ = period_kpis(index, period, reference, group)['pacientes']
+        assert current == _distinct(visits, start, reference, group)
+        previous_start = start - (pd.Timedelta(weeks=1) if period == 'semana' else pd.DateOffset(months=1))
+        previous_end = min(previous_start + (reference - start), start - pd.Timedelta(days=1))
+        assert previous == _distinct(visits, previous_start, previous_end, group)
+        assert current <= period_kpis(index, period, reference, group)['visitas'][0]
+
+
+def test_monthly_patients_differ_from_patient_days(visits):
+    index = build_kpi_index(visits)
+    current, _, _ = period_kpis(index, 'mes', '2024-03-31')['pacientes']
+    assert current == _distinct(visits, pd.Timestamp('2024-03-01'), pd.Timestamp('2024-03-31'))
+    assert current < period_kpis(index, 'mes', '2024-03-31')['visitas'][0]
@@ -0,0 +1,29 @@
+import pytest
+
+import datosgen
+from aggregations import compute_aggregates
+from data_loader import apply_schema
+from query_backend import duckdb_aggregates, pandas_aggregates
+
+duckdb = pytest.importorskip('duckdb')
+
+
+def test_duckdb_reads_parquet_paths_with_quotes(tmp_path):
+    path = tmp_path / "centro's datos.parquet"
+    datosgen.write_dataset(path, 3000, seed=1, fmt='parquet', workers=1, reference_date='2024-06-30')
+    assert set(duckdb_aggregates(path)) == set(pandas_aggregates(path))
+
+
+def test_duckdb_skips_derived_measures_without_their_base_columns(tmp_path):
+    # Proyección del panel de calidad: sin pago_seguros ni facturacion no hay porcentaje_cubierto
+    from app import PANEL_COLUMNS
+    columns = list(PANEL_COLUMNS["Análisis de calidad"])
+    data = apply_schema(datosgen.generate_dataset(3000, seed=2, workers=1, reference_date='2024-06-30'))[columns]
+    expected = compute_aggregates(data)
+    actual = duckdb_aggregates(data)
+    assert 'cobertura_por_centro' not in actual
+    assert set(actual) == set(expected)
+
+    path = tmp_path / 'calidad.parquet'
+    data.to_parquet(path)
+    assert set(duckdb_aggregates(path)) == set(expected)
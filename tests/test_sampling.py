@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from charts import billing_histogram
+from sampling import budgeted_scatter, stratified_sample
+
+
+def test_stratified_sample_keeps_missing_values_as_a_stratum():
+    data = pd.DataFrame({'g': pd.Categorical(['a', 'b', None] * 5000), 'v': np.arange(15000)})
+    sample = stratified_sample(data, 1000, by='g')
+    assert len(sample) <= 2000
+    assert sample['g'].isna().sum() > 0
+    assert set(sample['g'].dropna()) == {'a', 'b'}
+
+
+def test_density_figure_skips_missing_coordinates():
+    data = pd.DataFrame({'x': np.r_[np.arange(100.0), [np.nan] * 10], 'y': np.r_[np.arange(100.0), [1.0] * 10]})
+    fig = budgeted_scatter(data, 'x', 'y', raster_threshold=50)
+    assert np.nansum(fig.data[0].z) == 100
+
+
+def test_histogram_payload_does_not_grow_with_rows():
+    rng = np.random.default_rng(0)
+    sizes = []
+    for rows in (10_000, 200_000):
+        data = pd.DataFrame({'facturacion': rng.integers(800, 3000, rows), 'id_centro_salud': rng.integers(1, 6, rows)})
+        fig = billing_histogram(data, {}, 1000)
+        counts = sum(trace.y.sum() for trace in fig.data if trace.type == 'bar')
+        assert counts == rows
+        sizes.append(len(fig.to_json()))
+    assert sizes[1] < 1.5 * sizes[0]
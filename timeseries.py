@@ -0,0 +1,54 @@
+import pandas as pd
+
+# Granularidades disponibles y su frecuencia de pandas; las semanas empiezan en lunes
+GRAINS = {
+    'dia': 'D',
+    'semana': 'W-MON',
+    'mes': 'MS',
+}
+
+GRAIN_LABELS = {'dia': "Día", 'semana': "Semana", 'mes': "Mes"}
+
+# Tablas diarias de aggregations.CHART_AGGREGATIONS que alimentan las series
+DAILY_TABLES = ['serie_diaria', 'duracion_diaria']
+
+
+def daily_series(aggs):
+    # Une las tablas diarias disponibles en una serie indexada por día
+    tables = []
+    for name in DAILY_TABLES:
+        if name in aggs:
+            table = aggs[name].assign(fecha_visita=lambda t: pd.to_datetime(t['fecha_visita']).dt.floor('D'))
+            tables.append(table.groupby('fecha_visita').sum())
+    if not tables:
+        return None
+    series = tables[0]
+    for table in tables[1:]:
+        series = series.join(table.drop(columns=[c for c in table.columns if c in series.columns]), how='outer')
+    # Los días sin visitas cuentan como cero para que las ventanas móviles no salten huecos
+    return series.asfreq('D', fill_value=0)
+
+
+def build_rollups(aggs):
+    # Una tabla compacta por granularidad, calculada una vez por dataset
+    daily = daily_series(aggs)
+    if daily is None:
+        return {}
+    rollups = {'serie_dia': daily.rename_axis('fecha_visita').reset_index()}
+    for grain, freq in GRAINS.items():
+        if grain != 'dia':
+            table = daily.resample(freq, label='left', closed='left').sum()
+            rollups[f'serie_{grain}'] = table.rename_axis('fecha_visita').reset_index()
+    return rollups
+
+
+def rollup(aggs, grain='dia', columns=None, window=1):
+    # Serie a la granularidad pedida; window > 1 suaviza con una media móvil de esa cantidad de periodos
+    table = aggs[f'serie_{grain}'].set_index('fecha_visita')
+    if window > 1:
+        table = table.rolling(window, min_periods=1).mean()
+    if 'duracion_visita' in table.columns:
+        # Duración promedio ponderada por visitas, también dentro de la ventana
+        table = table.assign(duracion_promedio=table['duracion_visita'] / table['visitas'].where(table['visitas'] > 0))
+    table = table.reset_index()
+    return table if columns is None else table[['fecha_visita', *columns]]